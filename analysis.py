@@ -0,0 +1,376 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+import backtest
+import catalog
+import price_store
+import providers
+import resolutions
+import result_cache
+import screener
+import seasonal
+import significance
+from instrumentation import span, log_error
+
+# Headless seasonal analysis: fetch through the price store, build the
+# seasonal matrix, and answer window queries, with results shared through the
+# process-wide analysis cache. Nothing here depends on Streamlit, so the app,
+# the CLI/HTTP front end in pulse.py and batch jobs all run the same code.
+OVERLAY_WORKERS = 8
+# Start of the history used when no date range is given
+HISTORY_START = date(1900, 1, 1)
+# yfinance only serves hourly bars for roughly the last two years
+INTRADAY_INTERVAL = '60m'
+INTRADAY_DAYS = 729
+
+
+def provider_for(isin):
+    # Market data source for the ISIN's instrument type (see providers.py)
+    stock_info = catalog.load_catalog().lookup(isin) if providers.TYPE_PROVIDERS else None
+    return providers.get_provider(stock_info['instrument_type'] if stock_info else None)
+
+
+def fetch_returns(isin, start_date, end_date):
+    with span('fetch', isin=isin, start=start_date.strftime('%Y-%m-%d'), end=end_date.strftime('%Y-%m-%d')):
+        # Read from the local price store first; only missing ranges hit the provider
+        provider = provider_for(isin)
+        prices = price_store.get_prices(isin, start_date, end_date, provider.history,
+                                        fallback_tickers=provider.resolve(isin))
+        if prices.empty:
+            return pd.DataFrame(columns=['date', 'Close', 'daily_return'])
+
+        # Daily returns using Close (prices are already adjusted), NaNs dropped
+        return seasonal.daily_returns(prices)
+
+
+def intraday_range(interval=INTRADAY_INTERVAL):
+    # Store key suffix and the rolling date range of the hourly history; today's
+    # bars are still moving, so the range stops at yesterday like the daily store
+    end_date = date.today()
+    return f".{interval}", end_date - timedelta(days=INTRADAY_DAYS), end_date
+
+
+def fetch_intraday(isin, interval=INTRADAY_INTERVAL):
+    # Hourly bars are stored next to the daily history under '<ISIN>.<interval>',
+    # downloaded with the ticker the daily history resolved for the ISIN
+    meta = price_store.load_meta(isin)
+    if meta is None:
+        return pd.DataFrame(columns=price_store.PRICE_COLUMNS)
+    ticker = meta['ticker']
+    suffix, start_date, end_date = intraday_range(interval)
+
+    provider = provider_for(isin)
+    with span('fetch_intraday', isin=isin, interval=interval):
+        return price_store.get_prices(isin + suffix, start_date, end_date,
+                                      lambda _, start, end: provider.history(ticker, start, end, interval))
+
+
+def analysis_key(isin, start_date, end_date, exclude_years=()):
+    return (isin, price_store.to_date(start_date).isoformat(), price_store.to_date(end_date).isoformat(),
+            tuple(sorted(exclude_years)))
+
+
+def seasonal_analysis(isin, start_date, end_date, exclude_years=()):
+    # Seasonal matrix and average curve for an instrument, or None without data.
+    # A cached analysis is only valid while the store covers the range and
+    # hasn't been updated since it was computed.
+    key = analysis_key(isin, start_date, end_date, exclude_years)
+    version = price_store.stored_version(isin, start_date, end_date)
+    analysis = result_cache.analysis_cache.get(key, version) if version else None
+    if analysis is not None:
+        return analysis
+
+    df = fetch_returns(isin, start_date, end_date)
+    if df.empty:
+        return None
+
+    version = price_store.stored_version(isin, start_date, end_date)
+
+    # Excluded years are masked out of the seasonal matrix rather than the frame,
+    # so the matrix is cached once per date range and shared by every exclusion set
+    with span('seasonal', isin=isin, rows=len(df)):
+        matrix_key = ('matrix',) + key[:3]
+        matrix = result_cache.analysis_cache.get(matrix_key, version)
+        if matrix is None:
+            matrix = seasonal.shared(seasonal.SeasonalMatrix.from_prices(df), isin, key[1:3] + (version,))
+            result_cache.analysis_cache.put(matrix_key, matrix, version)
+        avg_returns = matrix.average_curve(exclude_years)
+    analysis = {
+        'key': key,
+        'seasonal': matrix,
+        'exclude_years': list(exclude_years),
+        # Earliest and latest dates
+        'earliest_date': df['date'].min().strftime('%Y-%m-%d'),
+        'latest_date': df['date'].max().strftime('%Y-%m-%d'),
+        # Average returns and growth (cumulative returns)
+        'avg_returns': avg_returns,
+        # Min and max growth for chart scaling
+        'min_growth': avg_returns['growth'].min(),
+        'max_growth': avg_returns['growth'].max(),
+    }
+    # The matrix is accounted for under its own key
+    result_cache.analysis_cache.put(key, analysis, version,
+                                    size=result_cache.estimate_size({k: v for k, v in analysis.items() if k != 'seasonal'}))
+    return analysis
+
+
+def analysis_version(analysis):
+    # Price store stamp the analysis' cached derivatives are valid for
+    return price_store.stored_version(*analysis['key'][:3])
+
+
+def window_analysis(analysis, start_doy, end_doy):
+    # Yearly returns, cumulative series and metrics for one day-of-year window
+    key = analysis['key'] + (start_doy, end_doy)
+    version = analysis_version(analysis)
+    window = result_cache.analysis_cache.get(key, version)
+    if window is not None:
+        return window
+
+    with span('window_metrics', isin=analysis['key'][0], start=start_doy, end=end_doy):
+        # Compounded return per year over the selected window, from the prefix sums
+        summary = analysis['seasonal'].window_summary(start_doy, end_doy, analysis['exclude_years'])
+
+        # Round the returns to two decimal places
+        yearly = pd.DataFrame({'year': summary['years'], 'Return': np.round(summary['returns'], 2)})
+
+        # Cumulative return based on yearly returns
+        cumulative = pd.DataFrame({'Year': yearly['year'], 'Cumulative_Return': np.cumsum(yearly['Return'])})
+
+    window = {'metrics': summary['metrics'], 'yearly': yearly, 'cumulative': cumulative}
+    result_cache.analysis_cache.put(key, window, version)
+    return window
+
+
+def window_returns(isin, start_md, end_md, exclude_years=(), start_date=HISTORY_START, end_date=None):
+    # Per-year returns and the seven window metrics for an 'MM-DD' window, from
+    # the prefix sums of the instrument's cached analysis; None without data
+    start_md, end_md = seasonal.parse_window(f"{start_md}:{end_md}")
+    analysis = seasonal_analysis(isin, start_date, end_date or date.today(), exclude_years)
+    if analysis is None:
+        return None
+    window = window_analysis(analysis, seasonal.to_day_of_year(start_md), seasonal.to_day_of_year(end_md))
+    return {'years': window['yearly']['year'].to_numpy(), 'returns': window['yearly']['Return'].to_numpy(),
+            'metrics': window['metrics']}
+
+
+def significance_analysis(analysis, start_doy, end_doy, resamples=significance.RESAMPLES):
+    # Random-window, sign-flip and bootstrap tests for one window, cached like the window itself
+    key = analysis['key'] + (start_doy, end_doy, 'significance', resamples)
+    version = analysis_version(analysis)
+    result = result_cache.analysis_cache.get(key, version)
+    if result is not None:
+        return result
+
+    with span('significance', isin=analysis['key'][0], start=start_doy, end=end_doy, resamples=resamples):
+        result = significance.window_significance(analysis['seasonal'], start_doy, end_doy,
+                                                  analysis['exclude_years'], resamples)
+    result_cache.analysis_cache.put(key, result, version)
+    return result
+
+
+def backtest_analysis(analysis, max_hold=backtest.MAX_HOLD, min_train_years=backtest.MIN_TRAIN_YEARS):
+    # Sweep of every (entry day, holding length) window, cached with the analysis
+    key = analysis['key'] + ('backtest', max_hold, min_train_years)
+    version = analysis_version(analysis)
+    result = result_cache.analysis_cache.get(key, version)
+    if result is not None:
+        return result
+
+    with span('backtest', isin=analysis['key'][0], max_hold=max_hold):
+        result = backtest.sweep(analysis['seasonal'], max_hold, analysis['exclude_years'], min_train_years)
+    result_cache.analysis_cache.put(key, result, version)
+    return result
+
+
+def resolution_profile(analysis, resolution):
+    # Seasonality at another scale from the same stored prices, cached per resolution
+    if resolution not in resolutions.PROFILES:
+        raise ValueError(f"Unknown resolution '{resolution}'")
+    isin, start_date, end_date, exclude_years = analysis['key']
+    key = analysis['key'] + ('resolution', resolution)
+
+    def version():
+        if resolution != 'hour':
+            return analysis_version(analysis)
+        # Hourly bars have their own store entry over a rolling recent range
+        suffix, intraday_start, intraday_end = intraday_range()
+        return price_store.stored_version(isin + suffix, intraday_start, intraday_end)
+
+    current = version()
+    profile = result_cache.analysis_cache.get(key, current) if current else None
+    if profile is not None:
+        return profile
+
+    if resolution == 'hour':
+        prices = fetch_intraday(isin)
+    else:
+        prices = fetch_returns(isin, price_store.to_date(start_date), price_store.to_date(end_date))
+    if prices.empty:
+        return None
+
+    with span('resolution_profile', isin=isin, resolution=resolution, rows=len(prices)):
+        profile = resolutions.PROFILES[resolution](prices, exclude_years)
+    result_cache.analysis_cache.put(key, profile, version())
+    return profile
+
+
+def screener_analysis(country, start_doy, end_doy, instrument_type='STOCK', exclude_years=(), sort_by='mean',
+                      workers=screener.APP_WORKERS):
+    # Ranked screener table for a country, cached until anything in the price store changes
+    key = ('screener', country.upper(), instrument_type.upper(), start_doy, end_doy, tuple(sorted(exclude_years)))
+    version = price_store.store_version()
+    results = result_cache.analysis_cache.get(key, version)
+    if results is None:
+        with span('screener', country=country, instrument_type=instrument_type, start=start_doy, end=end_doy):
+            results = screener.screen_country(country, start_doy, end_doy, instrument_type, exclude_years,
+                                              workers=workers)
+        result_cache.analysis_cache.put(key, results, version)
+    return results.sort_values(sort_by, ascending=False, kind='stable').reset_index(drop=True)
+
+
+def overlay_analysis(isins, start_date, end_date, exclude_years=(), workers=OVERLAY_WORKERS):
+    # Seasonal overlay of several instruments: analyses are loaded in parallel
+    # (cached ones are free, stored ones are disk reads), then every curve, the
+    # correlations and the basket come out of one seasonal.overlay pass
+    isins = list(dict.fromkeys(isins))
+    key = ('overlay', tuple(isins)) + analysis_key('', start_date, end_date, exclude_years)[1:]
+    # Instruments without data are part of the version too, so they are only retried once it changes
+    version = tuple(price_store.stored_version(isin, start_date, end_date) for isin in isins)
+    overlay = result_cache.analysis_cache.get(key, version)
+    if overlay is not None:
+        return overlay
+
+    def load(isin):
+        # One failing instrument is reported as missing instead of failing the overlay
+        try:
+            return seasonal_analysis(isin, start_date, end_date, exclude_years)
+        except Exception as e:
+            log_error('overlay_load_failed', isin=isin, error=str(e))
+            return None
+
+    with span('overlay_load', instruments=len(isins)):
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(isins)))) as pool:
+            analyses = list(pool.map(load, isins))
+
+    loaded = [(isin, analysis) for isin, analysis in zip(isins, analyses) if analysis is not None]
+    missing = [isin for isin, analysis in zip(isins, analyses) if analysis is None]
+    if not loaded:
+        return None
+
+    with span('overlay', instruments=len(loaded)):
+        result = seasonal.overlay([analysis['seasonal'] for _, analysis in loaded], exclude_years)
+
+    instruments = catalog.load_catalog()
+    names = []
+    for isin, _ in loaded:
+        info = instruments.lookup(isin)
+        names.append(info['company'] if info else isin)
+    labels = [f"{name} | {isin}" for name, (isin, _) in zip(names, loaded)]
+
+    days = ~np.isnan(result['basket_returns'])
+    growth = pd.DataFrame(result['growth'][:, days].T, columns=labels)
+    growth.insert(0, 'month_day', seasonal.MONTH_DAYS[days])
+    growth['Basket'] = result['basket_growth'][days]
+    overlay = {
+        'isins': [isin for isin, _ in loaded],
+        'labels': labels,
+        'missing': missing,
+        'growth': growth,
+        'correlation': pd.DataFrame(result['correlation'], index=labels, columns=labels),
+    }
+    result_cache.analysis_cache.put(key, overlay, tuple(price_store.stored_version(isin, start_date, end_date)
+                                                        for isin in isins))
+    return overlay
+
+
+def _json_number(value):
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    value = float(value)
+    return None if np.isnan(value) else value
+
+
+def seasonal_report(isin, start_date, end_date, exclude_years=(), window=None, curve=True, resamples=0):
+    # Plain-dict result for the CLI and HTTP endpoint; window is ('MM-DD', 'MM-DD')
+    analysis = seasonal_analysis(isin, start_date, end_date, exclude_years)
+    if analysis is None:
+        return None
+
+    start_md, end_md = window or (seasonal.MONTH_DAYS[0], seasonal.MONTH_DAYS[-1])
+    result = window_analysis(analysis, seasonal.to_day_of_year(start_md), seasonal.to_day_of_year(end_md))
+
+    report = {
+        'isin': isin,
+        'earliest_date': analysis['earliest_date'],
+        'latest_date': analysis['latest_date'],
+        'exclude_years': analysis['exclude_years'],
+        'window': {'start': start_md, 'end': end_md},
+        'metrics': {name: _json_number(value) for name, value in result['metrics'].items()},
+        'yearly_returns': [{'year': int(year), 'return': _json_number(ret)}
+                           for year, ret in zip(result['yearly']['year'], result['yearly']['Return'])],
+    }
+    if resamples:
+        tests = significance_analysis(analysis, seasonal.to_day_of_year(start_md), seasonal.to_day_of_year(end_md),
+                                      resamples)
+        if tests is not None:
+            report['significance'] = {name: [_json_number(bound) for bound in value] if name.endswith('_ci')
+                                      else None if value is None else _json_number(value)
+                                      for name, value in tests.items()}
+    if curve:
+        report['curve'] = [{'month_day': month_day, 'growth': round(float(growth), 4)}
+                           for month_day, growth in zip(analysis['avg_returns']['month_day'], analysis['avg_returns']['growth'])]
+    return report
+
+
+def overlay_report(isins, start_date, end_date, exclude_years=()):
+    # Plain-dict overlay summary: growth of $100 over the average year per instrument and the correlations
+    overlay = overlay_analysis(isins, start_date, end_date, exclude_years)
+    if overlay is None:
+        return None
+
+    final_growth = overlay['growth'].iloc[-1]
+    return {
+        'instruments': [{'isin': isin, 'label': label, 'growth': round(float(final_growth[label]), 4)}
+                        for isin, label in zip(overlay['isins'], overlay['labels'])],
+        'basket_growth': round(float(final_growth['Basket']), 4),
+        'missing': overlay['missing'],
+        'correlation': [[_json_number(value) for value in row] for row in overlay['correlation'].to_numpy()],
+    }
+
+
+def backtest_report(isin, start_date, end_date, exclude_years=(), max_hold=backtest.MAX_HOLD, metric='oos_score',
+                    top=20, min_years=10):
+    # Plain-dict list of the best windows from the backtest sweep
+    analysis = seasonal_analysis(isin, start_date, end_date, exclude_years)
+    if analysis is None:
+        return None
+
+    windows = backtest.best_windows(backtest_analysis(analysis, max_hold), metric, top, min_years)
+    return {
+        'isin': isin,
+        'earliest_date': analysis['earliest_date'],
+        'latest_date': analysis['latest_date'],
+        'exclude_years': analysis['exclude_years'],
+        'metric': metric,
+        'windows': [{name: _json_number(value) if name not in ('entry', 'exit') else value
+                     for name, value in row.items()} for row in windows.to_dict('records')],
+    }
+
+
+def resolution_report(isin, start_date, end_date, exclude_years=(), resolution='month'):
+    # Plain-dict per-bucket profile at one resolution
+    analysis = seasonal_analysis(isin, start_date, end_date, exclude_years)
+    if analysis is None:
+        return None
+    profile = resolution_profile(analysis, resolution)
+    if profile is None:
+        return None
+    return {
+        'isin': isin,
+        'resolution': resolution,
+        'exclude_years': analysis['exclude_years'],
+        'buckets': [{name: value if name == 'label' else _json_number(value) for name, value in row.items()}
+                    for row in profile.to_dict('records')],
+    }
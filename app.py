@@ -1,11 +1,24 @@
+import os
+import time
 import streamlit as st
-import altair as alt
-import numpy as np
-import yfinance as yf
 from datetime import datetime
-import pandas as pd
-from streamlit_extras.buy_me_a_coffee import button
 import streamlit.components.v1 as components
+import analysis as pulse_analysis
+import backtest
+import catalog
+import charts
+import instrumentation
+import prefetch
+import resolutions
+import result_cache
+import screener
+import seasonal
+import startup
+from instrumentation import span
+
+# Altair and yfinance are imported on first use; the catalog loads in the background
+startup.mark('imports')
+startup.preload()
 
 st.set_page_config(page_title="Pulse", layout="wide")
 
@@ -14,114 +27,33 @@ if 'show_animation' not in st.session_state:
 
 
 def load_particles_config():
-    with open('particles_config.html', 'r') as file:
-        return file.read()
+    # Read once per process, not on every rerun
+    return startup.read_asset('particles_config.html')
 
 # Where you use the particles configuration:
 particles_js = load_particles_config()
 
 # Load CSS file
 def local_css(file_name):
-    with open(file_name) as f:
-        st.markdown(f'<style>{f.read()}</style>', unsafe_allow_html=True)
+    st.markdown(f'<style>{startup.read_asset(file_name)}</style>', unsafe_allow_html=True)
 
 # Call function to load CSS file
 local_css('style.css')
 
 def example():
+    from streamlit_extras.buy_me_a_coffee import button
     button(username="ajwaldert", floating=True, width=221, bg_color= "#1d2cf3", font_color="#ffffff", coffee_color="#ffffff")
 
 
 
-@st.cache_data(ttl=60)
-def fetch_stock_tickers(instrument_type):
+def fetch_stock_tickers():
     try:
-        # Read from CSV instead of Supabase
-        df = pd.read_csv('all_stocks.csv')
-        
-        # Add instrument_type column based on ISIN prefixes
-        def determine_instrument_type(isin):
-            if pd.isna(isin):
-                return 'UNKNOWN'
-            # Add your instrument type logic here
-            return 'STOCK'  # Default to STOCK for now
-        
-        df['instrument_type'] = df['isin'].apply(determine_instrument_type)
-        
-        # Convert to the format expected by the rest of the app
-        tickers_db = df.to_dict('records')
-        
-        # Ensure uppercase for consistency
-        for ticker in tickers_db:
-            ticker['country'] = ticker['country'].upper()
-            ticker['instrument_type'] = ticker['instrument_type'].upper()
-        
-        return tickers_db
+        # Loaded once per process and only rebuilt when all_stocks.csv changes
+        with span('catalog_load'):
+            return catalog.load_catalog()
     except Exception as e:
         st.error(f"Error fetching stock tickers: {e}")
-        return []
-
-def fetch_data_by_ticker_and_date_range(isin, start_date, end_date):
-    try:
-        print(f"\nDEBUG INFO:")
-        print(f"ISIN received: {isin}")
-        
-        # Convert datetime to date strings in YYYY-MM-DD format
-        start_date_str = start_date.strftime('%Y-%m-%d')
-        end_date_str = end_date.strftime('%Y-%m-%d')
-        
-        print(f"Start date: {start_date_str}")
-        print(f"End date: {end_date_str}")
-        
-        # Try fetching data using ISIN directly
-        ticker_data = yf.download(
-            tickers=isin,
-            start=start_date_str,
-            end=end_date_str,
-            progress=False,
-            auto_adjust=True  # Use adjusted prices by default
-        )
-        
-        if ticker_data.empty:
-            print(f"No data found using ISIN directly, falling back to symbol lookup")
-            # Fallback to symbol if ISIN fails
-            stocks_df = pd.read_csv('all_stocks.csv')
-            stock_info = stocks_df[stocks_df['isin'] == isin].iloc[0]
-            symbol = stock_info['symbol'].strip()
-            print(f"Trying symbol: {symbol}")
-            
-            ticker_data = yf.download(
-                tickers=symbol,
-                start=start_date_str,
-                end=end_date_str,
-                progress=False,
-                auto_adjust=True
-            )
-        
-        if ticker_data.empty:
-            st.error(f"No data found for symbol {symbol} (ISIN: {isin})")
-            return pd.DataFrame()
-            
-        # Process the data
-        ticker_data.reset_index(inplace=True)
-        ticker_data.rename(columns={'Date': 'date'}, inplace=True)
-        
-        # Calculate daily returns using Close instead of Adj Close
-        ticker_data['daily_return'] = ticker_data['Close'].pct_change()
-        
-        # Create the month_day column
-        ticker_data['month_day'] = pd.to_datetime(ticker_data['date']).dt.strftime('%m-%d')
-        
-        # Drop any NaN values
-        ticker_data.dropna(inplace=True)
-
-        return ticker_data
-
-    except Exception as e:
-        st.error(f"Error processing data for {isin}: {str(e)}")
-        print(f"Full error: {str(e)}")
-        return pd.DataFrame()
-
+        return None
 
 def main():
 
@@ -137,18 +69,20 @@ def main():
                              help="Select the country.", key="analyzer country")
 
 
-    ticker_input = fetch_stock_tickers(instrument_type)
-
-
-    # Filter tickers based on the selected country and instrument type
-    filtered_tickers = [{'combined': ticker['combined'], 'symbol': ticker['symbol']} for ticker in ticker_input if
-                        ticker['country'].upper() == country and ticker[
-                            'instrument_type'].upper() == instrument_type]
+    ticker_input = fetch_stock_tickers()
 
-    # Create a list from ticker_input
-    ticker_input_list = [i['combined'] for i in filtered_tickers]
+    # Search by name, ISIN or symbol across every country; without a query the
+    # picker lists the start of the selected country. Only the top matches are
+    # sent to the browser instead of the whole country list.
+    search_query = col3.text_input("Search", placeholder="Name, ISIN or symbol", help="Type part of a name, ISIN or symbol and press Enter", key="analyzer search")
+    if ticker_input is None:
+        ticker_input_list = []
+    elif search_query.strip():
+        ticker_input_list = ticker_input.search(search_query, limit=50)
+    else:
+        ticker_input_list = ticker_input.options(country, instrument_type)[:50]
 
-    # Selectbox for tickers based on the selected country
+    # Selectbox for tickers based on the search or the selected country
     ticker = col3.selectbox("Name | ISIN", ticker_input_list, help="Select your instrument of choice either by name or ISIN", key = "analyzer ticker")
 
 
@@ -185,12 +119,19 @@ def main():
     end_date = datetime.combine(end_date, datetime.max.time())
 
 
-    # Need to initiate session state variables for each element we need
-    if 'df' not in st.session_state:
-        st.session_state.df = pd.DataFrame()
+    # Start downloading the picked instrument in the background before "Fetch Data" is pressed
+    prefetcher = prefetch.get_prefetcher()
+    if prefetcher is not None and ticker:
+        selection = (ticker, start_date, end_date, tuple(exclude_years))
+        if st.session_state.get('prefetched') != selection:
+            prefetcher.prefetch(ticker.split('|')[-1].strip(), start_date, end_date, exclude_years)
+            st.session_state.prefetched = selection
 
-    if 'avg_returns' not in st.session_state:
-        st.session_state.avg_returns = None
+    # Sessions only keep a handle (the analysis arguments); the analysis itself
+    # lives once per process in the shared result cache
+    if 'analysis_handle' not in st.session_state:
+        st.session_state.analysis_handle = None
+    analysis = None
 
     if fetch_button:
         if st.session_state.ticker:
@@ -199,35 +140,19 @@ def main():
 
             st.session_state.isin = isin
             st.session_state.company_name = company_name
-
-            # Initialize DataFrame in session state
-            if 'df' not in st.session_state:
-                st.session_state.df = pd.DataFrame()
-
-            # Fetching data
-            df = fetch_data_by_ticker_and_date_range(isin, start_date, end_date)
-            
-            if not df.empty:
-                st.session_state.df = df
-                
-                # Store earliest and latest dates
-                st.session_state.earliest_date = df['date'].min().strftime('%Y-%m-%d')
-                st.session_state.latest_date = df['date'].max().strftime('%Y-%m-%d')
-                
-                # Filter out excluded years
-                if exclude_years:
-                    st.session_state.df = st.session_state.df[~pd.to_datetime(st.session_state.df['date']).dt.year.isin(exclude_years)]
-
-                # Calculate average returns
-                st.session_state.avg_returns = st.session_state.df.groupby('month_day')['daily_return'].mean().reset_index()
-                
-                # Calculate growth (cumulative returns)
-                st.session_state.growth = (1 + st.session_state.avg_returns['daily_return']).cumprod() * 100
-                
-                # Calculate min and max growth for chart scaling
-                st.session_state.min_growth = st.session_state.growth.min()
-                st.session_state.max_growth = st.session_state.growth.max()
-                
+            if prefetcher is not None:
+                prefetcher.record(isin)
+
+            # Fetching data; analyses are shared across sessions through the result cache
+            try:
+                analysis = pulse_analysis.seasonal_analysis(isin, start_date, end_date, exclude_years)
+            except Exception as e:
+                st.error(f"Error processing data for {isin}: {str(e)}")
+                instrumentation.log_error('analysis_failed', isin=isin, error=repr(e))
+                analysis = None
+
+            if analysis is not None:
+                st.session_state.analysis_handle = (isin, start_date, end_date, tuple(exclude_years))
             else:
                 st.error("No data available for the selected ticker")
         else:
@@ -240,47 +165,28 @@ def main():
     st.divider()
     with st.container():
         col_4, col_5, col_6, col_7, col_8, col_9, col_10 = st.columns(7)
+    with st.container():
+        col_11, col_12, col_13, col_14, col_15, _, _ = st.columns(7)
     with st.container():
         col100, _, col101 = st.columns([96, 5, 64])
 
-    if not st.session_state.df.empty:
-        st.session_state.df['date'] = pd.to_datetime(st.session_state.df['date']).dt.strftime('%Y-%m-%d')
-
-        st.session_state.brush = alt.selection_interval(value={'x': [20, 40]}, name="Interval", empty=False, clear=False,  encodings=['x'], mark=alt.BrushConfig(fill='#1d2cf3', fillOpacity=0.3))
-
-        chart = alt.Chart(
-            pd.DataFrame({'Day_of_Year': st.session_state.avg_returns.month_day, 'Growth': st.session_state.growth.round(2)})
-        ).mark_line(
-            color='white',
-            strokeWidth=2,
-            interpolate='linear'
-        ).encode(
-            x=alt.X('Day_of_Year:T', title='Day of Year', axis=alt.Axis(format='%b %d', labelAngle=-90, tickCount=100)),
-            y=alt.Y('Growth:Q', title='Growth of $100', scale=alt.Scale(domain=[ st.session_state.min_growth,  st.session_state.max_growth])),
-            tooltip=[alt.Tooltip('Day_of_Year:T', format='%b %d'), 'Growth']
-        ).properties(
-            width=1200,
-            height=640,
-            background='rgba(0, 0, 0, 0)',
-            title={
-                "text": "Seasonal Pattern Chart",
-                "subtitle": "Depicting the growth of 100$ invested in the instrument averaged accross the years by each day of the year",
-                "color": "white",
-                "subtitleColor": "white",
-                "subtitleFontSize": 16
-            }).add_params(st.session_state.brush)
-
-        # Adjusting font sizes
-        chart = chart.configure_axis(
-            titleFontSize=14,  # Axis title font size
-            labelFontSize=12  # Tick label font size
-        ).configure_legend(
-            disable=True  # This line disables the legend
-        ).configure_title(
-            fontSize=20  # Chart title font size
-        )
-
-        data = col100.altair_chart(chart, use_container_width=True, on_select='rerun', key="my_chart")
+    if analysis is None and st.session_state.analysis_handle is not None:
+        # Cache hit on most reruns; rebuilt from the local price store if it was evicted
+        try:
+            analysis = pulse_analysis.seasonal_analysis(*st.session_state.analysis_handle)
+        except Exception as e:
+            st.error(f"Error processing data for {st.session_state.isin}: {str(e)}")
+
+    if analysis is not None:
+
+        # The seasonal chart only depends on the analysis, so its spec is serialized once and shared
+        with span('chart_build', chart='seasonal_pattern'):
+            chart = result_cache.analysis_cache.get_or_build(
+                analysis['key'] + ('seasonal_pattern_spec',), pulse_analysis.analysis_version(analysis),
+                lambda: charts.seasonal_pattern_spec(analysis['avg_returns'], analysis['min_growth'], analysis['max_growth']))
+
+        with span('chart_render', chart='seasonal_pattern'):
+            data = col100.vega_lite_chart(chart, use_container_width=True, on_select='rerun', key="my_chart")
 
         selection_data = data  # Get the JSON response from Altair chart selection
         #st.write(selection_data)
@@ -292,9 +198,9 @@ def main():
             # Convert Unix timestamps to human-readable dates
             readable_dates = [datetime.fromtimestamp(ts / 1000).strftime('%m-%d') for ts in unix_timestamps]
 
-            # Convert selected dates to datetime with the same reference year
-            start_filter = datetime.strptime('2000-' + readable_dates[0], '%Y-%m-%d')
-            end_filter = datetime.strptime('2000-' + readable_dates[1], '%Y-%m-%d')
+            # Convert selected dates to day-of-year columns of the seasonal matrix
+            start_filter = seasonal.MONTH_DAY_INDEX[readable_dates[0]]
+            end_filter = seasonal.MONTH_DAY_INDEX[readable_dates[1]]
             # Assuming readable_dates contains the start and end dates
             start_date_str = readable_dates[0]
             end_date_str = readable_dates[1]
@@ -319,128 +225,127 @@ def main():
             col8.markdown(
                 f"<h1 style='text-align: left; color: white;'>{st.session_state.company_name} - {st.session_state.isin}</h1>",
                 unsafe_allow_html=True)
-            start_filter = '2000-01-01'
-            end_filter = '2000-12-31'
-
-        col8.write(f"Data used for analysis: {st.session_state.earliest_date} to {st.session_state.latest_date}")
+            start_filter = 0
+            end_filter = seasonal.DAYS_IN_YEAR - 1
 
-        pattern_return = st.session_state.df.copy()
-        # Ensure 'month_day' is a string
-        pattern_return['month_day'] = pattern_return['month_day'].astype(str)
+        col8.write(f"Data used for analysis: {analysis['earliest_date']} to {analysis['latest_date']}")
 
-        pattern_return['month_day'] = pd.to_datetime('2000-' + pattern_return['month_day'], format='%Y-%m-%d')
+        # Remember the window so the screener can rank the country by the same pattern
+        st.session_state.window = (start_filter, end_filter)
 
-        pattern_return = pattern_return[
-            (pattern_return['month_day'] >= start_filter) & (pattern_return['month_day'] <= end_filter)]
-
-        pattern_return['date'] = pd.to_datetime(pattern_return['date'])
-
-        pattern_return['year'] = pattern_return['date'].dt.year
-
-        pattern_return_grouped = pattern_return.groupby('year')['daily_return'].apply(lambda x: (1 + x).prod() - 1).reset_index()
-
-        # Rename the column to 'Return'
-        pattern_return_grouped = pattern_return_grouped.rename(columns={'daily_return': 'Return'})
-
-        # Round the returns to two decimal places
-        pattern_return_grouped['Return'] = pattern_return_grouped['Return'].round(2)
+        # Yearly returns for the selected window, shared across sessions like the analysis itself
+        window = pulse_analysis.window_analysis(analysis, start_filter, end_filter)
+        metrics = window['metrics']
+        pattern_return_grouped = window['yearly']
+        cumulative_data_yearly = window['cumulative']
 
         #Adding Metrics
-        col_4.metric("Maximum Pattern Growth", f"{pattern_return_grouped['Return'].max() * 100:.2f}%")
-        col_5.metric("Maximum Pattern Drawdown", f"{pattern_return_grouped['Return'].min() * 100:.2f}%")
-        col_6.metric("Average Pattern Return", f"{pattern_return_grouped['Return'].mean() * 100:.2f}%")
-        col_7.metric("Cumulative Pattern Return", f"{(pattern_return['daily_return']).sum():.2%}")
-        col_8.metric("Positive Returns", f"{len(pattern_return_grouped[pattern_return_grouped['Return'] > 0]):.0f}")
-        col_9.metric("Negative Returns", f"{len(pattern_return_grouped[pattern_return_grouped['Return'] < 0]):.0f}")
-        col_10.metric("Positive / Negative Ratio %",f"{(len(pattern_return_grouped[pattern_return_grouped['Return'] > 0]) / len(pattern_return_grouped) * 100):.2f}%")
+        col_4.metric("Maximum Pattern Growth", f"{metrics['max'] * 100:.2f}%")
+        col_5.metric("Maximum Pattern Drawdown", f"{metrics['min'] * 100:.2f}%")
+        col_6.metric("Average Pattern Return", f"{metrics['mean'] * 100:.2f}%")
+        col_7.metric("Cumulative Pattern Return", f"{metrics['cumulative']:.2%}")
+        col_8.metric("Positive Returns", f"{metrics['positive']:.0f}")
+        col_9.metric("Negative Returns", f"{metrics['negative']:.0f}")
+        col_10.metric("Positive / Negative Ratio %",f"{metrics['ratio'] * 100:.2f}%")
+
+        # Is the window better than chance? Resampled once per window and shared like the metrics
+        tests = pulse_analysis.significance_analysis(analysis, start_filter, end_filter)
+        if tests is not None:
+            level = f"{tests['confidence'] * 100:.0f}%"
+            col_11.metric(f"Average Return {level} CI", f"{tests['mean_ci'][0]:.2%} to {tests['mean_ci'][1]:.2%}",
+                          help="Bootstrap over the years of the pattern")
+            col_12.metric(f"Positive Ratio {level} CI", f"{tests['hit_rate_ci'][0]:.0%} to {tests['hit_rate_ci'][1]:.0%}",
+                          help="Bootstrap over the years of the pattern")
+            # Randomly timed windows only exist for windows shorter than the year
+            if tests['p_mean'] is not None:
+                col_13.metric("p-Value Return vs Random", f"{tests['p_mean']:.3f}",
+                              help=f"Share of {tests['resamples']:,} randomly timed windows of the same length with an average return at least as high")
+                col_14.metric("p-Value Ratio vs Random", f"{tests['p_hit_rate']:.3f}",
+                              help=f"Share of {tests['resamples']:,} randomly timed windows of the same length with a positive ratio at least as high")
+            col_15.metric("p-Value Return vs Zero", f"{tests['p_sign']:.3f}",
+                          help="Sign-flip permutation test of the average return")
 
         # st.dataframe(yearly_returns)
 
-        # Create the bar chart
-        bar_chart = alt.Chart(pattern_return_grouped).mark_bar(color='#E5E5E5').encode(
-            x=alt.X('year:O', title='Year'),
-            y=alt.Y('Return:Q', title='Yearly Return', axis=alt.Axis(format='%')),
-            tooltip=[alt.Tooltip('year:O', title='Year'),
-                     alt.Tooltip('Return:Q', title='Return', format='.2%')]
-        ).properties(
-            width=700,
-            height=300,
-            title='Yearly Pattern Return'
-        )
-
-        # Highlight the top 3 years
-        highlighted_bars = alt.Chart(pattern_return_grouped.nlargest(3, 'Return')).mark_bar(color='#1d2cf3',
-                                                                                    opacity=1).encode(
-            x=alt.X('year:O', title='Year'),
-            y=alt.Y('Return:Q', title='Yearly Return', axis=alt.Axis(format='%')),
-            tooltip=[alt.Tooltip('year:O', title='Year'),
-                     alt.Tooltip('Return:Q', title='Return', format='.2%')]
-        )
-
-        # Combine the charts
-        combined_chart = alt.layer(bar_chart, highlighted_bars).properties(
-            width=700,
-            height=300,
-            background='rgba(0, 0, 0, 0)',  # Set background to transparent
-            title='Pattern Return by Year'
-        ).configure_view(
-            stroke=None  # Ensure no border stroke is applied
-        ).configure_axis(
-            titleFontSize=14,  # Axis title font size
-            labelFontSize=12  # Tick label font size
-        ).configure_legend(
-            disable=True  # This line disables the legend
-        ).configure_title(
-            fontSize=20  # Chart title font size
-        )
-
-        st.session_state.combined_chart = combined_chart
-
-        # Calculate cumulative return based on yearly returns
-        cumulative_return_yearly = np.cumsum(pattern_return_grouped['Return'])
-
-        # Create DataFrame with cumulative return based on yearly returns
-        cumulative_data_yearly = pd.DataFrame(
-            {'Year': pattern_return_grouped['year'], 'Cumulative_Return': cumulative_return_yearly})
-
-        # Update area_chart to display cumulative return based on yearly returns
-        area_chart_yearly = alt.Chart(cumulative_data_yearly).mark_area(
-            line={'color': 'lightblue'},
-            color=alt.Gradient(
-                gradient='linear',
-                stops=[
-                    alt.GradientStop(color='white', offset=0),
-                    alt.GradientStop(color='#1d2cf3', offset=1)
-                ],
-                x1=1,
-                x2=1,
-                y1=1,
-                y2=0
-            )
-        ).encode(
-            x=alt.X('Year:O', title='Year'),
-            y=alt.Y('Cumulative_Return:Q', title='Cumulative Return', axis=alt.Axis(format='%')),
-            tooltip=[alt.Tooltip('Year:O', title='Year'),
-                     alt.Tooltip('Cumulative_Return:Q', title='Cumulative Return', format='.2%')]
-            # Format as percentage
-        ).properties(
-            width=700,
-            height=300,
-            background='rgba(0, 0, 0, 0)',
-            title='Cumulative Pattern Return'
-        ).configure_axis(
-            titleFontSize=14,  # Axis title font size
-            labelFontSize=12  # Tick label font size
-        ).configure_legend(
-            disable=True  # This line disables the legend
-        ).configure_title(
-            fontSize=20  # Chart title font size
-        )
-
-
-        col101.altair_chart( st.session_state.combined_chart, use_container_width=True)
-        col101.altair_chart(area_chart_yearly, use_container_width=True)
+        # Only the per-year data changes with the brush; the specs are prebuilt templates
+        with span('chart_build', chart='yearly'):
+            combined_chart = charts.pattern_return_spec(pattern_return_grouped)
+            area_chart_yearly = charts.cumulative_return_spec(cumulative_data_yearly)
+
+        with span('chart_render', chart='yearly'):
+            col101.vega_lite_chart(combined_chart, use_container_width=True)
+            col101.vega_lite_chart(area_chart_yearly, use_container_width=True)
         st.markdown('<hr class="hr-opacity">', unsafe_allow_html=True)
+
+        with st.expander("Seasonality by Resolution"):
+            resolution = st.selectbox("Resolution", list(resolutions.RESOLUTIONS), format_func=resolutions.RESOLUTIONS.get, key="resolution name")
+            if resolution == 'hour':
+                st.write("Hour of day uses hourly bars from roughly the last two years, in the exchange's local time.")
+            try:
+                profile = pulse_analysis.resolution_profile(analysis, resolution)
+            except Exception as e:
+                st.error(f"Error computing {resolutions.RESOLUTIONS[resolution].lower()} seasonality: {str(e)}")
+                profile = None
+            if profile is None:
+                st.info("No data available at this resolution")
+            else:
+                with span('chart_build', chart='resolution'):
+                    resolution_chart = charts.resolution_spec(profile, resolutions.RESOLUTIONS[resolution])
+                with span('chart_render', chart='resolution'):
+                    st.vega_lite_chart(resolution_chart, use_container_width=True)
+
+        with st.expander("Backtest Sweep"):
+            st.write("Every entry day and holding length over the year, with a walk-forward score that only trades a window in years after its earlier history was positive.")
+            bcol1, bcol2, bcol3 = st.columns(3)
+            max_hold = bcol1.slider("Max Holding Days", 5, 120, backtest.MAX_HOLD, key="backtest max_hold")
+            metric = bcol2.selectbox("Rank by", backtest.METRICS, key="backtest metric")
+            min_years = bcol3.number_input("Min Years", 1, 100, 10, key="backtest min_years")
+            if st.button("Run Backtest", key="backtest run"):
+                st.session_state.backtest = (analysis['key'], max_hold)
+            if st.session_state.get('backtest') == (analysis['key'], max_hold):
+                sweep = pulse_analysis.backtest_analysis(analysis, max_hold)
+                with span('chart_build', chart='backtest'):
+                    heatmap = charts.backtest_spec(backtest.to_frame(sweep), metric)
+                with span('chart_render', chart='backtest'):
+                    st.vega_lite_chart(heatmap, use_container_width=True)
+                st.dataframe(backtest.best_windows(sweep, metric, min_years=min_years), use_container_width=True, hide_index=True)
+
+    with st.expander("Seasonal Overlay"):
+        st.write("Compare the seasonal curves of several instruments, their pairwise seasonal correlation and an equal-weight basket.")
+        overlay_input = st.text_area("ISINs", value=st.session_state.get('isin', ''), help="One ISIN per line or separated by commas; use the search box to find them.", key="overlay isins")
+        if st.button("Build Overlay", key="overlay run"):
+            overlay_isins = [isin.strip().upper() for isin in overlay_input.replace(',', '\n').splitlines() if isin.strip()]
+            st.session_state.overlay_handle = (tuple(overlay_isins), start_date, end_date, tuple(exclude_years)) if overlay_isins else None
+
+        overlay = None
+        if st.session_state.get('overlay_handle') is not None:
+            try:
+                overlay = pulse_analysis.overlay_analysis(*st.session_state.overlay_handle)
+            except Exception as e:
+                st.error(f"Error building overlay: {str(e)}")
+            if overlay is None:
+                st.error("No data available for the selected instruments")
+        if overlay is not None:
+            if overlay['missing']:
+                st.warning(f"No data for: {', '.join(overlay['missing'])}")
+            with span('chart_build', chart='overlay'):
+                overlay_chart = charts.overlay_spec(overlay['growth'])
+            with span('chart_render', chart='overlay'):
+                st.vega_lite_chart(overlay_chart, use_container_width=True)
+            st.dataframe(overlay['correlation'].round(2), use_container_width=True)
+
+    with st.expander("Seasonal Screener"):
+        start_doy, end_doy = st.session_state.get('window', (0, seasonal.DAYS_IN_YEAR - 1))
+        st.write(f"Rank every {instrument_type.lower()} in {country.title()} with cached price data by the "
+                 f"pattern from {seasonal.MONTH_DAYS[start_doy]} to {seasonal.MONTH_DAYS[end_doy]}.")
+        sort_by = st.selectbox("Rank by", screener.SORT_COLUMNS, key="screener sort_by")
+        if st.button("Run Screener", key="screener run"):
+            results = pulse_analysis.screener_analysis(country, start_doy, end_doy, instrument_type, exclude_years,
+                                                       sort_by=sort_by)
+            if results.empty:
+                st.info("No cached price data for this country yet. Warm it up with bulk_fetch.py.")
+            else:
+                st.dataframe(results, use_container_width=True, hide_index=True)
     st.text("")
     st.text("")
 
@@ -459,5 +364,23 @@ def main():
 
     example()
 
+
+def debug_panel(rerun_started):
+    # Per-rerun timing breakdown, shown with ?debug=1 or PULSE_DEBUG=1
+    spans = instrumentation.rerun_spans()
+    with st.expander("Timing (this rerun)", expanded=True):
+        st.write(f"Rerun so far: {(time.perf_counter() - rerun_started) * 1000:.1f} ms")
+        st.write({'startup_ms': startup.timings()})
+        if spans:
+            st.dataframe(spans, use_container_width=True, hide_index=True)
+        st.write(result_cache.analysis_cache.stats())
+
+
 if __name__ == "__main__":
-    main()
+    rerun_started = time.perf_counter()
+    instrumentation.start_rerun()
+    with span('rerun'):
+        main()
+    startup.mark('first_rerun')
+    if os.environ.get('PULSE_DEBUG') == '1' or st.query_params.get('debug') == '1':
+        debug_panel(rerun_started)
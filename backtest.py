@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+from seasonal import DAYS_IN_YEAR, MONTH_DAYS
+
+# Walk-forward backtest of seasonal windows. Every (entry day, holding length)
+# pair is evaluated at once: the seasonal matrix is laid out as one continuous
+# day axis (years x 366, Feb 29 empty in non-leap years) with log-return and
+# observation prefix sums, so a window's return in every year is a difference
+# of two prefix values and the whole sweep is a years x 366 x holds array.
+# Windows may run past Dec 31 into the next year.
+MAX_HOLD = 60
+MIN_TRAIN_YEARS = 5
+METRICS = ('oos_score', 'mean', 'median', 'hit_rate', 'worst')
+
+
+def sweep_returns(matrix, max_hold=MAX_HOLD, exclude_years=()):
+    # Compounded return per (year, entry day, holding length); NaN where the
+    # year has no observations in the window or the window runs past the data
+    keep = matrix.year_mask(exclude_years)
+    flat_log = np.where(keep[:, None], matrix.log_returns, 0.0).ravel()
+    flat_count = np.where(keep[:, None], matrix.observed, False).ravel()
+
+    prefix_log = np.concatenate([[0.0], np.cumsum(flat_log)])
+    prefix_count = np.concatenate([[0], np.cumsum(flat_count)])
+    holds = np.arange(1, max_hold + 1)
+
+    starts = (np.arange(len(matrix.years)) * DAYS_IN_YEAR)[:, None] + np.arange(DAYS_IN_YEAR)[None, :]
+    ends = starts[:, :, None] + holds[None, None, :]
+    inside = ends < len(prefix_log)
+    ends = np.minimum(ends, len(prefix_log) - 1)
+
+    log_return = prefix_log[ends] - prefix_log[starts][:, :, None]
+    counts = prefix_count[ends] - prefix_count[starts][:, :, None]
+    # Only years kept and actually traded in the window count towards the statistics
+    valid = inside & (counts > 0) & keep[:, None, None]
+    return holds, np.where(valid, np.expm1(log_return), np.nan)
+
+
+def walk_forward(returns, min_train_years=MIN_TRAIN_YEARS):
+    # Trade a window in year t only if its mean return over the earlier years
+    # (at least min_train_years of them) was positive; the score is the
+    # average return per tested year, flat years counting as zero
+    valid = ~np.isnan(returns)
+    prior_sum = np.cumsum(np.where(valid, returns, 0.0), axis=0) - np.where(valid, returns, 0.0)
+    prior_count = np.cumsum(valid, axis=0) - valid
+
+    tested = valid & (prior_count >= min_train_years)
+    traded = tested & (prior_sum > 0)
+    tested_years = tested.sum(axis=0)
+    oos_total = np.where(traded, returns, 0.0).sum(axis=0)
+    score = np.divide(oos_total, tested_years, out=np.full(tested_years.shape, np.nan), where=tested_years > 0)
+    return score, traded.sum(axis=0)
+
+
+def sweep(matrix, max_hold=MAX_HOLD, exclude_years=(), min_train_years=MIN_TRAIN_YEARS):
+    # In-sample statistics and the walk-forward score for every window, as 366 x holds arrays
+    holds, returns = sweep_returns(matrix, max_hold, exclude_years)
+    valid = ~np.isnan(returns)
+    years = valid.sum(axis=0)
+    has_data = years > 0
+
+    def per_window(reduce):
+        out = np.full(years.shape, np.nan)
+        out[has_data] = reduce(returns[:, has_data], axis=0)
+        return out
+
+    score, trades = walk_forward(returns, min_train_years)
+    return {
+        'holds': holds,
+        'years': years,
+        'hit_rate': np.divide((returns > 0).sum(axis=0), years, out=np.full(years.shape, np.nan), where=has_data),
+        'mean': per_window(np.nanmean),
+        'median': per_window(np.nanmedian),
+        'worst': per_window(np.nanmin),
+        'oos_score': score,
+        'oos_trades': trades,
+    }
+
+
+def to_frame(result):
+    # One row per (entry day, holding length) with 'MM-DD' entry and exit labels
+    entry, hold = np.meshgrid(np.arange(DAYS_IN_YEAR), result['holds'], indexing='ij')
+    return pd.DataFrame({
+        'entry': MONTH_DAYS[entry.ravel()],
+        'exit': MONTH_DAYS[(entry + hold - 1).ravel() % DAYS_IN_YEAR],
+        'hold': hold.ravel(),
+        'years': result['years'].ravel(),
+        **{name: result[name].ravel() for name in ('hit_rate', 'mean', 'median', 'worst', 'oos_score', 'oos_trades')},
+    })
+
+
+def best_windows(result, metric='oos_score', top=20, min_years=10):
+    # Highest ranked windows with enough history to mean something
+    frame = to_frame(result)
+    frame = frame[(frame['years'] >= min_years) & frame[metric].notna()]
+    return frame.sort_values(metric, ascending=False, kind='stable').head(top).reset_index(drop=True)
@@ -0,0 +1,207 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+from datetime import datetime
+
+# Offline benchmarks for the fetch -> seasonal -> metrics pipeline. Everything
+# runs against synthetic price histories and catalogs written to a temporary
+# data directory, so no network access or existing price store is needed.
+#
+#   python benchmarks.py --years 1 30 120 --catalog-rows 19000 500000 --output bench.json
+BENCH_DIR = None
+if __name__ == "__main__":
+    BENCH_DIR = os.environ['PULSE_DATA_DIR'] = tempfile.mkdtemp(prefix='pulse-bench-')
+
+import numpy as np
+import pandas as pd
+import backtest
+import catalog
+import charts
+import price_store
+import providers
+import resolutions
+import seasonal
+import significance
+
+COUNTRIES = ['netherlands', 'germany', 'france', 'switzerland', 'united states', 'united kingdom', 'india',
+             'australia', 'china', 'brazil', 'japan', 'indonesia', 'south korea']
+ISIN_PREFIXES = ['NL', 'DE', 'FR', 'CH', 'US', 'GB', 'IN', 'AU', 'CN', 'BR', 'JP', 'ID', 'KR']
+
+
+def timed(fn, repeat):
+    # Run fn `repeat` times and summarize wall time in milliseconds
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return {
+        'min_ms': round(min(samples), 4),
+        'median_ms': round(statistics.median(samples), 4),
+        'mean_ms': round(statistics.fmean(samples), 4),
+        'max_ms': round(max(samples), 4),
+        'repeat': repeat,
+    }
+
+
+def synthetic_prices(years, seed=0, end='2024-12-31'):
+    # Geometric random walk on business days
+    dates = pd.bdate_range(end=end, periods=int(years * 261))
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0.0002, 0.012, len(dates))))
+    return pd.DataFrame({'date': dates, 'Open': close, 'High': close * 1.01, 'Low': close * 0.99,
+                         'Close': close, 'Volume': rng.integers(1_000, 1_000_000, len(dates))})
+
+
+def synthetic_catalog(rows, seed=0):
+    # Country mix roughly follows all_stocks.csv: large markets get more rows
+    rng = np.random.default_rng(seed)
+    weights = np.linspace(2, 1, len(COUNTRIES))
+    country_index = rng.choice(len(COUNTRIES), size=rows, p=weights / weights.sum())
+    isins = np.array([f"{ISIN_PREFIXES[c]}{i:010d}" for i, c in enumerate(country_index)], dtype=object)
+    company = np.array([f"Company {i}" for i in range(rows)], dtype=object)
+    return pd.DataFrame({
+        'country': np.array(COUNTRIES, dtype=object)[country_index],
+        'company': company,
+        'isin': isins,
+        'symbol': np.array([f"S{i}" for i in range(rows)], dtype=object),
+        'combined': company + ' | ' + isins,
+    })
+
+
+def bench_catalog(rows, workdir, repeat):
+    csv_file = os.path.join(workdir, f"catalog_{rows}.csv")
+    snapshot_file = os.path.join(workdir, f"catalog_{rows}.pkl")
+    synthetic_catalog(rows).to_csv(csv_file, index=False)
+
+    def cold_csv():
+        if os.path.exists(snapshot_file):
+            os.remove(snapshot_file)
+        catalog.build_catalog(csv_file, snapshot_file=None)
+
+    instruments = catalog.build_catalog(csv_file, snapshot_file)
+
+    def filter_cold():
+        instruments._options.clear()
+        instruments.options('UNITED STATES', 'STOCK')
+
+    return {
+        'rows': rows,
+        'load_csv': timed(cold_csv, repeat),
+        'load_snapshot': timed(lambda: catalog.build_catalog(csv_file, snapshot_file), repeat),
+        'country_filter_first': timed(filter_cold, repeat),
+        'country_filter_cached': timed(lambda: instruments.options('UNITED STATES', 'STOCK'), repeat),
+        'isin_lookup': timed(lambda: instruments.lookup(instruments.isin[rows // 2]), repeat),
+        'search_name': timed(lambda: instruments.search(f"company {rows // 3}"), repeat),
+        'search_isin': timed(lambda: instruments.search(instruments.isin[rows // 2]), repeat),
+        'search_country': timed(lambda: instruments.search('comp', country='UNITED STATES'), repeat),
+    }
+
+
+def bench_instrument(years, repeat):
+    isin = f"BENCH{int(years * 100):06d}"
+    prices = synthetic_prices(years)
+    price_store.save_prices(isin, prices, {'ticker': isin, 'start': '1800-01-01', 'end': '2100-01-01',
+                                           'updated_at': datetime.now().isoformat()})
+
+    def no_download(ticker, start, end):
+        raise RuntimeError("benchmarks must not hit the network")
+
+    start, end = datetime(1800, 1, 1), datetime(2100, 1, 1)
+    # A first fetch into an empty store, served by the offline replay provider
+    replay = providers.ReplayProvider(os.path.join(price_store.DATA_DIR, 'replay'))
+    replay.record(isin, prices)
+    cold_keys = iter(f"{isin}C{i}" for i in range(repeat + 1))
+    returns = seasonal.daily_returns(price_store.get_prices(isin, start, end, no_download))
+    matrix = seasonal.SeasonalMatrix.from_prices(returns)
+    avg_returns = matrix.average_curve()
+    rng = np.random.default_rng(1)
+    windows = [tuple(sorted(rng.integers(0, seasonal.DAYS_IN_YEAR, 2))) for _ in range(64)]
+    window_iter = iter(windows * (repeat + 1))
+    summary = matrix.window_summary(59, 105)
+    yearly = pd.DataFrame({'year': summary['years'], 'Return': np.round(summary['returns'], 2)})
+    cumulative = pd.DataFrame({'Year': yearly['year'], 'Cumulative_Return': np.cumsum(yearly['Return'])})
+
+    def brush():
+        matrix.window_summary(*next(window_iter))
+
+    def build_charts():
+        charts.seasonal_pattern_chart(avg_returns, avg_returns['growth'].min(), avg_returns['growth'].max()).to_dict()
+        charts.pattern_return_chart(yearly).to_dict()
+        charts.cumulative_return_chart(cumulative).to_dict()
+
+    def build_specs():
+        # Per-brush work with cached templates: the seasonal spec is reused as-is
+        charts.pattern_return_spec(yearly)
+        charts.cumulative_return_spec(cumulative)
+
+    return {
+        'years': years,
+        'rows': len(prices),
+        'replay_fetch': timed(lambda: price_store.get_prices(next(cold_keys), start, end,
+                                                            lambda _, s, e: replay.history(isin, s, e)), repeat),
+        'store_read': timed(lambda: price_store.get_prices(isin, start, end, no_download), repeat),
+        'daily_returns': timed(lambda: seasonal.daily_returns(prices), repeat),
+        'seasonal_matrix': timed(lambda: seasonal.SeasonalMatrix.from_prices(returns), repeat),
+        'average_curve': timed(matrix.average_curve, repeat),
+        'window_brush': timed(brush, repeat),
+        'daily_resolutions': timed(lambda: [resolutions.PROFILES[name](returns) for name in resolutions.PROFILES
+                                            if name != 'hour'], repeat),
+        'backtest_sweep': timed(lambda: backtest.sweep(matrix), repeat),
+        'significance_10k': timed(lambda: significance.window_significance(matrix, 59, 105, resamples=10000,
+                                                                           workers=1), repeat),
+        'overlay_50': timed(lambda: seasonal.overlay([matrix] * 50), repeat),
+        'chart_build': timed(build_charts, repeat),
+        'seasonal_spec': timed(lambda: charts.seasonal_pattern_spec(avg_returns, avg_returns['growth'].min(),
+                                                                    avg_returns['growth'].max()), repeat),
+        'brush_specs': timed(build_specs, repeat),
+    }
+
+
+def run(years_list, catalog_rows, repeat):
+    workdir = price_store.DATA_DIR
+    os.makedirs(workdir, exist_ok=True)
+    return {
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'platform': platform.platform(),
+        },
+        'catalog': [bench_catalog(rows, workdir, repeat) for rows in catalog_rows],
+        'instrument': [bench_instrument(years, repeat) for years in years_list],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline Pulse pipeline benchmarks.")
+    parser.add_argument('--years', type=float, nargs='+', default=[1, 30, 120], help="History lengths to time")
+    parser.add_argument('--catalog-rows', type=int, nargs='+', default=[19_000, 500_000], help="Catalog sizes to time")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help="Write the JSON results here instead of stdout")
+    args = parser.parse_args()
+
+    try:
+        results = run(args.years, args.catalog_rows, args.repeat)
+    finally:
+        if BENCH_DIR:
+            shutil.rmtree(BENCH_DIR, ignore_errors=True)
+
+    payload = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(payload)
+        print(f"Wrote {args.output}", file=sys.stderr)
+    else:
+        print(payload)
+
+
+if __name__ == "__main__":
+    main()
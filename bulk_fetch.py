@@ -0,0 +1,228 @@
+import os
+import json
+import time
+import random
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from datetime import date, datetime
+import catalog
+import price_store
+import providers
+
+# Bulk warm-up of the price store: ISINs are downloaded in batches through
+# the provider's batch history (yfinance's multi-ticker download), throttled
+# by a token bucket and retried with exponential backoff. Completed ISINs are
+# checkpointed per job so an interrupted run picks up where it stopped.
+PROGRESS_DIR = os.path.join(price_store.DATA_DIR, 'bulk_fetch')
+
+
+class TokenBucket:
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def download_with_retry(provider, tickers, start_date, end_date, limiter, retries=4, backoff=2.0, threads=8):
+    # A batch that comes back completely empty is most likely throttled, so it
+    # is retried with exponential backoff and jitter before giving up on it
+    for attempt in range(retries + 1):
+        limiter.acquire()
+        try:
+            frames = provider.batch_history(tickers, start_date, end_date, threads=threads)
+            if frames or attempt == retries:
+                return frames
+            print(f"Empty batch of {len(tickers)} tickers, retrying (attempt {attempt + 1})")
+        except Exception as e:
+            if attempt == retries:
+                print(f"Batch failed after {retries + 1} attempts: {str(e)}")
+                return {}
+            print(f"Batch error, retrying (attempt {attempt + 1}): {str(e)}")
+        time.sleep(backoff * (2 ** attempt) * (0.5 + random.random()))
+    return {}
+
+
+def load_progress(job):
+    try:
+        with open(os.path.join(PROGRESS_DIR, f"{job}.json"), 'r') as file:
+            progress = json.load(file)
+    except (FileNotFoundError, ValueError):
+        progress = {}
+    return {'done': set(progress.get('done', [])), 'not_found': set(progress.get('not_found', []))}
+
+
+def save_progress(job, progress):
+    os.makedirs(PROGRESS_DIR, exist_ok=True)
+    path = os.path.join(PROGRESS_DIR, f"{job}.json")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as file:
+        json.dump({key: sorted(value) for key, value in progress.items()}, file)
+    os.replace(tmp_path, path)
+
+
+def _store_batch(entries, frames, start, end):
+    # entries: (isin, ticker, meta) for one batch; returns the ISINs stored
+    stored = []
+    for isin, ticker, meta in entries:
+        ticker_data = frames.get(ticker)
+        if ticker_data is None:
+            continue
+        with price_store.lock_for(isin):
+            # Re-read under the lock in case an interactive session updated it meanwhile
+            meta = price_store.load_meta(isin)
+            prices = price_store.load_prices(isin)
+            # The batch was requested over the union of every entry's gaps
+            gaps = price_store.missing_ranges(meta, start, end, include_checked=False)
+            fetched = [(gap_start, gap_end, ticker_data) for gap_start, gap_end in gaps]
+            price_store.merge_prices(isin, ticker, meta, prices, fetched)
+        stored.append(isin)
+    return stored
+
+
+def bulk_fetch(isins, start_date, end_date, job='bulk', batch_size=50, workers=4, rate=1.0,
+               retries=4, symbols=None, provider=None):
+    # Warm the price store for every ISIN in [start_date, end_date).
+    # `symbols` maps ISIN -> exchange symbol, used when the ISIN itself isn't found.
+    start = price_store.to_date(start_date)
+    end = price_store.to_date(end_date)
+    symbols = symbols or {}
+    provider = provider or providers.get_provider()
+    limiter = TokenBucket(rate)
+    progress = load_progress(job)
+
+    pending = [isin for isin in isins if isin not in progress['done'] and isin not in progress['not_found']]
+    print(f"{len(isins)} instruments, {len(isins) - len(pending)} already done, {len(pending)} to fetch")
+
+    progress_lock = threading.Lock()
+
+    def record(future):
+        with progress_lock:
+            progress['done'].update(future.result())
+
+    # Tickers missing from a batch that otherwise came back were most likely
+    # throttled (yfinance returns them all-NaN), so they go back in the queue
+    # for a later batch, up to `retries` times
+    queue = deque(pending)
+    attempts = {}
+    skipped = set()
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while queue:
+            batch = [queue.popleft() for _ in range(min(batch_size, len(queue)))]
+            entries = []
+            gap_start, gap_end = end, start
+            for isin in batch:
+                meta = price_store.load_meta(isin)
+                if not price_store.missing_ranges(meta, start, end):
+                    with progress_lock:
+                        progress['done'].add(isin)
+                    continue
+                gaps = price_store.missing_ranges(meta, start, end, include_checked=False)
+                gap_start = min(gap_start, gaps[0][0])
+                gap_end = max(gap_end, gaps[-1][1])
+                entries.append((isin, meta['ticker'] if meta else isin, meta))
+
+            if entries:
+                frames = download_with_retry(provider, [t for _, t, _ in entries], gap_start, gap_end, limiter,
+                                             retries=retries, threads=workers)
+
+                # ISINs the source doesn't know get a second batched pass by symbol
+                missing = [(isin, symbols[isin].strip(), meta) for isin, ticker, meta in entries
+                           if ticker not in frames and meta is None and isinstance(symbols.get(isin), str)]
+                if missing:
+                    frames.update(download_with_retry(provider, [t for _, t, _ in missing], gap_start, gap_end, limiter,
+                                                      retries=retries, threads=workers))
+                    missing_isins = {isin for isin, _, _ in missing}
+                    entries = [e for e in entries if e[0] not in missing_isins] + missing
+
+                if not frames:
+                    # Nothing came back even after retries; don't extend coverage, retry next run
+                    print(f"Batch of {len(entries)} produced no data, leaving it for the next run")
+                    skipped.update(isin for isin, _, _ in entries)
+                    continue
+
+                requeued = 0
+                with progress_lock:
+                    for isin, ticker, meta in entries:
+                        if ticker in frames:
+                            continue
+                        attempts[isin] = attempts.get(isin, 0) + 1
+                        if attempts[isin] <= retries:
+                            queue.append(isin)
+                            requeued += 1
+                        elif meta is None:
+                            progress['not_found'].add(isin)
+                        else:
+                            # Known instrument that kept coming back empty; left pending for the next run
+                            skipped.add(isin)
+                if requeued:
+                    print(f"{requeued} tickers missing from the batch, retrying them in a later batch")
+
+                # Writing this batch to the store overlaps with downloading the next one
+                pool.submit(_store_batch, entries, frames, gap_start, gap_end).add_done_callback(record)
+
+            with progress_lock:
+                save_progress(job, progress)
+                done = len(progress['done']) + len(progress['not_found'])
+            print(f"Progress: {done}/{len(isins)} ({time.monotonic() - started:.0f}s elapsed)")
+
+    save_progress(job, progress)
+    print(f"Finished: {len(progress['done'])} stored, {len(progress['not_found'])} not found, "
+          f"{len(skipped)} left for the next run in {time.monotonic() - started:.0f}s")
+    return progress
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm the local price store for many instruments.")
+    parser.add_argument('--country', action='append', help="Country from all_stocks.csv (repeatable)")
+    parser.add_argument('--isin', action='append', help="Explicit ISIN (repeatable)")
+    parser.add_argument('--instrument-type', default='STOCK')
+    parser.add_argument('--start', default='1900-01-01')
+    parser.add_argument('--end', default=date.today().isoformat())
+    parser.add_argument('--batch-size', type=int, default=50)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--rate', type=float, default=1.0, help="Batch requests per second")
+    parser.add_argument('--retries', type=int, default=4)
+    parser.add_argument('--job', help="Progress checkpoint name (defaults to the countries)")
+    args = parser.parse_args()
+
+    instruments = catalog.load_catalog()
+    isins = list(args.isin or [])
+    for country in args.country or []:
+        rows = instruments.rows(country, args.instrument_type)
+        isins.extend(i for i in instruments.isin[rows] if isinstance(i, str))
+    if not isins:
+        parser.error("Select at least one --country or --isin")
+
+    symbols = {}
+    for isin in isins:
+        info = instruments.lookup(isin)
+        if info is not None:
+            symbols[isin] = info['symbol']
+
+    job = args.job or '_'.join(c.lower().replace(' ', '-') for c in args.country or ['isins'])
+    bulk_fetch(isins, datetime.strptime(args.start, '%Y-%m-%d'), datetime.strptime(args.end, '%Y-%m-%d'),
+               job=job, batch_size=args.batch_size, workers=args.workers, rate=args.rate,
+               retries=args.retries, symbols=symbols, provider=providers.get_provider(args.instrument_type))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import os
+import pickle
+import threading
+import numpy as np
+import pandas as pd
+from price_store import DATA_DIR
+from search import SearchIndex
+from instrumentation import log_error
+
+# Instrument catalog built from all_stocks.csv. Rows are sorted by
+# (country, instrument_type) so every combination is a contiguous row range,
+# and string columns are kept as NumPy arrays next to an ISIN -> row index
+# and a prefix search index over name, ISIN and symbol.
+CSV_FILE = 'all_stocks.csv'
+SNAPSHOT_FILE = os.path.join(DATA_DIR, 'catalog.pkl')
+SNAPSHOT_VERSION = 3
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def read_catalog_csv(path):
+    # Every column is text; numeric-looking symbols like '000001' keep their leading zeros
+    return pd.read_csv(path, dtype=str)
+
+
+def determine_instrument_types(isins):
+    # Add your instrument type logic here; default to STOCK for now
+    return np.where(pd.isna(isins), 'UNKNOWN', 'STOCK')
+
+
+class Catalog:
+
+    def __init__(self, df, fingerprint=None):
+        self.fingerprint = fingerprint
+
+        df = df.copy()
+        df['country'] = df['country'].astype(str).str.upper()
+        df['instrument_type'] = determine_instrument_types(df['isin'].to_numpy())
+        df = df.sort_values(['country', 'instrument_type'], kind='stable').reset_index(drop=True)
+
+        country = df['country'].astype('category')
+        instrument_type = df['instrument_type'].astype('category')
+        self.countries = list(country.cat.categories)
+        self.instrument_types = list(instrument_type.cat.categories)
+        self.country_codes = country.cat.codes.to_numpy(dtype=np.int16)
+        self.instrument_type_codes = instrument_type.cat.codes.to_numpy(dtype=np.int16)
+
+        self.company = df['company'].to_numpy(dtype=object)
+        self.isin = df['isin'].to_numpy(dtype=object)
+        self.symbol = df['symbol'].to_numpy(dtype=object)
+        self.combined = df['combined'].to_numpy(dtype=object)
+
+        # (country, instrument_type) -> (start, stop) row range
+        self.ranges = {}
+        keys = df['country'] + '\0' + df['instrument_type']
+        boundaries = np.flatnonzero(keys.to_numpy()[1:] != keys.to_numpy()[:-1]) + 1
+        starts = np.concatenate([[0], boundaries]) if len(df) else np.array([], dtype=int)
+        stops = np.concatenate([boundaries, [len(df)]]) if len(df) else np.array([], dtype=int)
+        for start, stop in zip(starts, stops):
+            self.ranges[(df['country'].iat[start], df['instrument_type'].iat[start])] = (int(start), int(stop))
+
+        # ISIN -> row; keep the last occurrence like drop_duplicates(keep='last')
+        self.isin_index = {isin: row for row, isin in enumerate(self.isin) if isinstance(isin, str)}
+
+        self.search_index = SearchIndex(self.company, self.isin, self.symbol)
+
+        self._options = {}
+
+    def __len__(self):
+        return len(self.isin)
+
+    def rows(self, country, instrument_type):
+        start, stop = self.ranges.get((country.upper(), instrument_type.upper()), (0, 0))
+        return slice(start, stop)
+
+    def options(self, country, instrument_type):
+        # "Name | ISIN" strings for the selectbox, built once per combination
+        key = (country.upper(), instrument_type.upper())
+        if key not in self._options:
+            self._options[key] = self.combined[self.rows(*key)].tolist()
+        return self._options[key]
+
+    def search(self, query, limit=20, country=None, instrument_type=None):
+        # "Name | ISIN" strings matching a typeahead query, optionally within one country/type
+        row_range = None
+        if country is not None:
+            selected = self.rows(country, instrument_type or 'STOCK')
+            row_range = (selected.start, selected.stop)
+        rows = self.search_index.search(query, limit, row_range)
+        return self.combined[rows].tolist() if rows else []
+
+    def lookup(self, isin):
+        row = self.isin_index.get(isin)
+        if row is None:
+            return None
+        return {
+            'country': self.countries[self.country_codes[row]],
+            'company': self.company[row],
+            'isin': self.isin[row],
+            'symbol': self.symbol[row],
+            'combined': self.combined[row],
+            'instrument_type': self.instrument_types[self.instrument_type_codes[row]],
+        }
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_options'] = {}
+        return state
+
+
+def _fingerprint(csv_file):
+    stat = os.stat(csv_file)
+    return (SNAPSHOT_VERSION, stat.st_size, stat.st_mtime_ns)
+
+
+def _load_snapshot(fingerprint, snapshot_file):
+    try:
+        with open(snapshot_file, 'rb') as file:
+            catalog = pickle.load(file)
+    except (FileNotFoundError, pickle.UnpicklingError, EOFError, AttributeError):
+        return None
+    return catalog if catalog.fingerprint == fingerprint else None
+
+
+def _save_snapshot(catalog, snapshot_file):
+    os.makedirs(os.path.dirname(snapshot_file) or '.', exist_ok=True)
+    tmp_file = f"{snapshot_file}.{os.getpid()}.tmp"
+    with open(tmp_file, 'wb') as file:
+        pickle.dump(catalog, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_file, snapshot_file)
+
+
+def build_catalog(csv_file=CSV_FILE, snapshot_file=SNAPSHOT_FILE):
+    # Use the binary snapshot when it matches the CSV, otherwise parse and refresh it
+    fingerprint = _fingerprint(csv_file)
+    if snapshot_file:
+        catalog = _load_snapshot(fingerprint, snapshot_file)
+        if catalog is not None:
+            return catalog
+
+    catalog = Catalog(read_catalog_csv(csv_file), fingerprint)
+    if snapshot_file:
+        try:
+            _save_snapshot(catalog, snapshot_file)
+        except OSError as e:
+            log_error('catalog_snapshot_failed', path=snapshot_file, error=str(e))
+    return catalog
+
+
+def load_catalog(csv_file=CSV_FILE, snapshot_file=SNAPSHOT_FILE):
+    # Process-wide catalog; only rebuilt when all_stocks.csv changes on disk
+    global _catalog
+    fingerprint = _fingerprint(csv_file)
+    if _catalog is not None and _catalog.fingerprint == fingerprint:
+        return _catalog
+
+    with _catalog_lock:
+        if _catalog is None or _catalog.fingerprint != fingerprint:
+            _catalog = build_catalog(csv_file, snapshot_file)
+        return _catalog
@@ -0,0 +1,285 @@
+import threading
+import pandas as pd
+
+# Altair chart builders for the analysis view; they only take the computed
+# analysis data, so they can be built and timed outside of a Streamlit run.
+#
+# The *_spec functions return serialized Vega-Lite dicts for st.vega_lite_chart.
+# Specs whose data only changes with the brush are built once per process as
+# templates over named datasets, so a brush move only swaps the few rows of
+# per-year data instead of re-running Altair's serialization and validation.
+# No series sent to the browser is long enough to need downsampling: the
+# seasonal and overlay curves have one point per day of the year (366).
+# Altair is imported by the builders themselves: it is the slowest import of
+# the app, and a cold worker only needs it once the first chart is drawn.
+_templates = {}
+_templates_lock = threading.Lock()
+
+
+def _template(name, build):
+    with _templates_lock:
+        if name not in _templates:
+            _templates[name] = build()
+        return _templates[name]
+
+
+def seasonal_pattern_chart(avg_returns, min_growth, max_growth):
+    # Growth of $100 along the average day-of-year curve, with the interval brush
+    import altair as alt
+    brush = alt.selection_interval(value={'x': [20, 40]}, name="Interval", empty=False, clear=False,  encodings=['x'], mark=alt.BrushConfig(fill='#1d2cf3', fillOpacity=0.3))
+
+    chart = alt.Chart(
+        pd.DataFrame({'Day_of_Year': avg_returns['month_day'], 'Growth': avg_returns['growth'].round(2)})
+    ).mark_line(
+        color='white',
+        strokeWidth=2,
+        interpolate='linear'
+    ).encode(
+        x=alt.X('Day_of_Year:T', title='Day of Year', axis=alt.Axis(format='%b %d', labelAngle=-90, tickCount=100)),
+        y=alt.Y('Growth:Q', title='Growth of $100', scale=alt.Scale(domain=[ min_growth,  max_growth])),
+        tooltip=[alt.Tooltip('Day_of_Year:T', format='%b %d'), 'Growth']
+    ).properties(
+        width=1200,
+        height=640,
+        background='rgba(0, 0, 0, 0)',
+        title={
+            "text": "Seasonal Pattern Chart",
+            "subtitle": "Depicting the growth of 100$ invested in the instrument averaged accross the years by each day of the year",
+            "color": "white",
+            "subtitleColor": "white",
+            "subtitleFontSize": 16
+        }).add_params(brush)
+
+    # Adjusting font sizes
+    chart = chart.configure_axis(
+        titleFontSize=14,  # Axis title font size
+        labelFontSize=12  # Tick label font size
+    ).configure_legend(
+        disable=True  # This line disables the legend
+    ).configure_title(
+        fontSize=20  # Chart title font size
+    )
+
+    return chart
+
+
+def pattern_return_chart(yearly, top_years=None):
+    # Data may be frames or alt.NamedData placeholders (see pattern_return_spec)
+    import altair as alt
+    if top_years is None:
+        top_years = yearly.nlargest(3, 'Return')
+
+    # Create the bar chart
+    bar_chart = alt.Chart(yearly).mark_bar(color='#E5E5E5').encode(
+        x=alt.X('year:O', title='Year'),
+        y=alt.Y('Return:Q', title='Yearly Return', axis=alt.Axis(format='%')),
+        tooltip=[alt.Tooltip('year:O', title='Year'),
+                 alt.Tooltip('Return:Q', title='Return', format='.2%')]
+    ).properties(
+        width=700,
+        height=300,
+        title='Yearly Pattern Return'
+    )
+
+    # Highlight the top 3 years
+    highlighted_bars = alt.Chart(top_years).mark_bar(color='#1d2cf3', opacity=1).encode(
+        x=alt.X('year:O', title='Year'),
+        y=alt.Y('Return:Q', title='Yearly Return', axis=alt.Axis(format='%')),
+        tooltip=[alt.Tooltip('year:O', title='Year'),
+                 alt.Tooltip('Return:Q', title='Return', format='.2%')]
+    )
+
+    # Combine the charts
+    combined_chart = alt.layer(bar_chart, highlighted_bars).properties(
+        width=700,
+        height=300,
+        background='rgba(0, 0, 0, 0)',  # Set background to transparent
+        title='Pattern Return by Year'
+    ).configure_view(
+        stroke=None  # Ensure no border stroke is applied
+    ).configure_axis(
+        titleFontSize=14,  # Axis title font size
+        labelFontSize=12  # Tick label font size
+    ).configure_legend(
+        disable=True  # This line disables the legend
+    ).configure_title(
+        fontSize=20  # Chart title font size
+    )
+
+    return combined_chart
+
+
+def cumulative_return_chart(cumulative):
+    # Update area_chart to display cumulative return based on yearly returns
+    import altair as alt
+    area_chart_yearly = alt.Chart(cumulative).mark_area(
+        line={'color': 'lightblue'},
+        color=alt.Gradient(
+            gradient='linear',
+            stops=[
+                alt.GradientStop(color='white', offset=0),
+                alt.GradientStop(color='#1d2cf3', offset=1)
+            ],
+            x1=1,
+            x2=1,
+            y1=1,
+            y2=0
+        )
+    ).encode(
+        x=alt.X('Year:O', title='Year'),
+        y=alt.Y('Cumulative_Return:Q', title='Cumulative Return', axis=alt.Axis(format='%')),
+        tooltip=[alt.Tooltip('Year:O', title='Year'),
+                 alt.Tooltip('Cumulative_Return:Q', title='Cumulative Return', format='.2%')]
+        # Format as percentage
+    ).properties(
+        width=700,
+        height=300,
+        background='rgba(0, 0, 0, 0)',
+        title='Cumulative Pattern Return'
+    ).configure_axis(
+        titleFontSize=14,  # Axis title font size
+        labelFontSize=12  # Tick label font size
+    ).configure_legend(
+        disable=True  # This line disables the legend
+    ).configure_title(
+        fontSize=20  # Chart title font size
+    )
+
+    return area_chart_yearly
+
+
+def seasonal_pattern_spec(avg_returns, min_growth, max_growth):
+    # Built once per analysis result by the caller's cache; the brush lives in the spec
+    return seasonal_pattern_chart(avg_returns, min_growth, max_growth).to_dict()
+
+
+def pattern_return_spec(yearly):
+    import altair as alt
+    template = _template('pattern_return', lambda: pattern_return_chart(
+        alt.NamedData(name='yearly'), alt.NamedData(name='top_years')).to_dict())
+    return {**template, 'datasets': {'yearly': yearly, 'top_years': yearly.nlargest(3, 'Return')}}
+
+
+def cumulative_return_spec(cumulative):
+    import altair as alt
+    template = _template('cumulative_return', lambda: cumulative_return_chart(
+        alt.NamedData(name='cumulative')).to_dict())
+    return {**template, 'datasets': {'cumulative': cumulative}}
+
+
+def overlay_chart(growth):
+    # One growth-of-$100 line per instrument plus the equal-weight basket in white
+    import altair as alt
+    long = growth.melt(id_vars='month_day', var_name='Instrument', value_name='Growth')
+    long['Growth'] = long['Growth'].round(2)
+    long = long.rename(columns={'month_day': 'Day_of_Year'})
+
+    base = alt.Chart(long).encode(
+        x=alt.X('Day_of_Year:T', title='Day of Year', axis=alt.Axis(format='%b %d', labelAngle=-90, tickCount=100)),
+        y=alt.Y('Growth:Q', title='Growth of $100', scale=alt.Scale(zero=False)),
+        tooltip=['Instrument', alt.Tooltip('Day_of_Year:T', format='%b %d'), 'Growth']
+    )
+    instruments = base.transform_filter(alt.datum.Instrument != 'Basket').mark_line(
+        strokeWidth=1.5, opacity=0.7
+    ).encode(color=alt.Color('Instrument:N', legend=alt.Legend(orient='bottom', columns=3, labelLimit=300)))
+    basket = base.transform_filter(alt.datum.Instrument == 'Basket').mark_line(color='white', strokeWidth=3)
+
+    return alt.layer(instruments, basket).properties(
+        width=1200,
+        height=640,
+        background='rgba(0, 0, 0, 0)',
+        title={
+            "text": "Seasonal Overlay",
+            "subtitle": "Growth of 100$ along each instrument's average seasonal curve; the white line is the equal-weight basket",
+            "color": "white",
+            "subtitleColor": "white",
+            "subtitleFontSize": 16
+        }
+    ).configure_axis(
+        titleFontSize=14,  # Axis title font size
+        labelFontSize=12  # Tick label font size
+    ).configure_legend(
+        labelColor='white',
+        labelFontSize=12
+    ).configure_title(
+        fontSize=20  # Chart title font size
+    )
+
+
+def overlay_spec(growth):
+    return overlay_chart(growth).to_dict()
+
+
+def backtest_heatmap(data, metric='oos_score'):
+    # Entry day x holding length, coloured by the chosen sweep metric
+    import altair as alt
+    percent = metric != 'oos_trades'
+
+    return alt.Chart(data).mark_rect().encode(
+        x=alt.X('entry:T', title='Entry Day', axis=alt.Axis(format='%b %d', labelAngle=-90, tickCount=24)),
+        y=alt.Y('hold:O', title='Holding Days', sort='descending'),
+        color=alt.Color(f'{metric}:Q', title=metric, scale=alt.Scale(scheme='blueorange', domainMid=0)),
+        tooltip=[alt.Tooltip('entry:T', title='Entry', format='%b %d'), alt.Tooltip('exit:T', title='Exit', format='%b %d'),
+                 'hold:O', 'years:Q', alt.Tooltip(f'{metric}:Q', format='.2%' if percent else 'd')]
+    ).properties(
+        width=1200,
+        height=400,
+        background='rgba(0, 0, 0, 0)',
+        title={
+            "text": "Seasonal Backtest Sweep",
+            "subtitle": "Every entry day and holding length; the walk-forward score only trades windows whose earlier years were positive",
+            "color": "white",
+            "subtitleColor": "white",
+            "subtitleFontSize": 16
+        }
+    ).configure_axis(
+        titleFontSize=14,  # Axis title font size
+        labelFontSize=12  # Tick label font size
+    ).configure_legend(
+        labelColor='white',
+        titleColor='white'
+    ).configure_title(
+        fontSize=20  # Chart title font size
+    )
+
+
+def backtest_spec(frame, metric='oos_score'):
+    # 366 x holds cells is past Altair's inline row limit, so the data goes in as a named dataset
+    import altair as alt
+    template = _template(f'backtest_{metric}', lambda: backtest_heatmap(alt.NamedData(name='sweep'), metric).to_dict())
+    data = frame[['entry', 'exit', 'hold', 'years', metric]].round({metric: 4})
+    return {**template, 'datasets': {'sweep': data}}
+
+
+def resolution_chart(profile, title):
+    # Mean period return per bucket, in bucket order, with hit rate and count in the tooltip
+    import altair as alt
+    data = profile[['bucket', 'label', 'mean', 'median', 'hit_rate', 'observations']].round(6)
+    order = data.sort_values('bucket')['label'].tolist()
+
+    return alt.Chart(data).mark_bar().encode(
+        x=alt.X('label:N', title=title, sort=order, axis=alt.Axis(labelAngle=-90)),
+        y=alt.Y('mean:Q', title='Average Return', axis=alt.Axis(format='%')),
+        color=alt.condition(alt.datum.mean > 0, alt.value('#1d2cf3'), alt.value('#E5E5E5')),
+        tooltip=[alt.Tooltip('label:N', title=title),
+                 alt.Tooltip('mean:Q', title='Mean', format='.3%'),
+                 alt.Tooltip('median:Q', title='Median', format='.3%'),
+                 alt.Tooltip('hit_rate:Q', title='Hit Rate', format='.1%'),
+                 alt.Tooltip('observations:Q', title='Observations')]
+    ).properties(
+        width=1200,
+        height=300,
+        background='rgba(0, 0, 0, 0)',
+        title=f'Average Return by {title}'
+    ).configure_axis(
+        titleFontSize=14,  # Axis title font size
+        labelFontSize=12  # Tick label font size
+    ).configure_legend(
+        disable=True  # This line disables the legend
+    ).configure_title(
+        fontSize=20  # Chart title font size
+    )
+
+
+def resolution_spec(profile, title):
+    return resolution_chart(profile, title).to_dict()
@@ -0,0 +1,129 @@
+import os
+import sys
+import json
+import time
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Timing spans around Pulse's hot paths. Every span is
+#   - logged as a structured JSON line on the 'pulse' logger at INFO, so only
+#     with PULSE_LOG_LEVEL=INFO (failures are logged at WARNING, the default),
+#   - added to a process-wide Prometheus-style histogram per span name,
+#   - appended to the current rerun's span list, for the app's debug panel.
+logger = logging.getLogger('pulse')
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(os.environ.get('PULSE_LOG_LEVEL', 'WARNING').upper())
+    logger.propagate = False
+
+# Histogram bucket upper bounds in seconds
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_histograms = {}
+_counters = {}
+_metrics_lock = threading.Lock()
+
+_rerun_spans = contextvars.ContextVar('pulse_rerun_spans', default=None)
+_span_depth = contextvars.ContextVar('pulse_span_depth', default=0)
+
+
+def _log(level, event, fields):
+    if logger.isEnabledFor(level):
+        logger.log(level, json.dumps({'ts': round(time.time(), 3), 'event': event, **fields}, default=str))
+
+
+def log_event(event, **fields):
+    _log(logging.INFO, event, fields)
+
+
+def log_error(event, **fields):
+    # Failures are logged at WARNING, so they show up with the default log level
+    _log(logging.WARNING, event, fields)
+
+
+def observe(name, seconds):
+    with _metrics_lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = {'buckets': [0] * len(BUCKETS), 'sum': 0.0, 'count': 0}
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                histogram['buckets'][i] += 1
+        histogram['sum'] += seconds
+        histogram['count'] += 1
+
+
+def increment(name, value=1):
+    with _metrics_lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+@contextmanager
+def span(name, **fields):
+    # Time the enclosed block; extra fields only go into the log line
+    depth = _span_depth.get()
+    token = _span_depth.set(depth + 1)
+    started = time.perf_counter()
+    error = None
+    try:
+        yield
+    except Exception as e:
+        error = type(e).__name__
+        raise
+    finally:
+        seconds = time.perf_counter() - started
+        _span_depth.reset(token)
+        observe(name, seconds)
+        if error:
+            increment(f"{name}_errors")
+
+        spans = _rerun_spans.get()
+        if spans is not None:
+            spans.append({'span': name, 'depth': depth, 'ms': round(seconds * 1000, 3), **fields})
+        (log_error if error else log_event)('span', span=name, ms=round(seconds * 1000, 3), error=error, **fields)
+
+
+def process_rss():
+    # Resident set size of this process in bytes (current on Linux, peak elsewhere)
+    try:
+        with open('/proc/self/statm', 'r') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def start_rerun():
+    # Begin collecting spans for one Streamlit script run in this context
+    _rerun_spans.set([])
+
+
+def rerun_spans():
+    return list(_rerun_spans.get() or [])
+
+
+def render_prometheus(extra_gauges=None):
+    # Text exposition format for histograms, counters and optional gauges
+    lines = []
+    with _metrics_lock:
+        if _histograms:
+            lines.append('# HELP pulse_span_seconds Duration of instrumented Pulse spans.')
+            lines.append('# TYPE pulse_span_seconds histogram')
+        for name, histogram in sorted(_histograms.items()):
+            for bound, count in zip(BUCKETS, histogram['buckets']):
+                lines.append(f'pulse_span_seconds_bucket{{span="{name}",le="{bound}"}} {count}')
+            lines.append(f'pulse_span_seconds_bucket{{span="{name}",le="+Inf"}} {histogram["count"]}')
+            lines.append(f'pulse_span_seconds_sum{{span="{name}"}} {histogram["sum"]}')
+            lines.append(f'pulse_span_seconds_count{{span="{name}"}} {histogram["count"]}')
+        for name, value in sorted(_counters.items()):
+            lines.append(f'# TYPE pulse_{name}_total counter')
+            lines.append(f'pulse_{name}_total {value}')
+    for name, value in sorted((extra_gauges or {}).items()):
+        lines.append(f'# TYPE pulse_{name} gauge')
+        lines.append(f'pulse_{name} {value}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,240 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+# Load test of the Streamlit app: simulated sessions click through the real
+# app.py with Streamlit's AppTest, against an empty price store that fills up
+# from the offline replay provider, so no network is involved:
+#
+#   python loadtest.py --workers 1 2 4 --sessions 8 --flows 2 --output load.json
+#
+# Every flow picks a country and instrument, fetches, moves the brush a few
+# times, excludes some years and fetches again. Each worker count runs that
+# many worker processes with --sessions concurrent sessions each; the report
+# has rerun latency percentiles (overall and per action), throughput and the
+# peak RSS of every worker.
+#
+# AppTest keeps the script runtime in global state, so one worker process
+# executes one rerun at a time. A rerun is almost entirely GIL-bound Python
+# and pandas work, which is how a worker serializes concurrent sessions anyway;
+# the time a rerun waits behind the others is reported as queueing.
+LOADTEST_DIR = None
+if __name__ == "__main__":
+    LOADTEST_DIR = os.environ['PULSE_DATA_DIR'] = tempfile.mkdtemp(prefix='pulse-load-')
+    os.environ['PULSE_PROVIDER'] = 'replay'
+    os.environ['PULSE_REPLAY_DIR'] = os.path.join(LOADTEST_DIR, 'replay')
+    os.environ.setdefault('PULSE_LOG_LEVEL', 'WARNING')
+
+import numpy as np
+import catalog
+import providers
+import price_store
+import seasonal
+from benchmarks import synthetic_prices
+from instrumentation import process_rss
+
+APP_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+PERCENTILES = (50, 90, 95, 99)
+HISTORY_YEARS = 30
+LAST_YEAR = 2024
+RSS_INTERVAL = 0.05
+RUN_TIMEOUT = 120
+
+_rerun_lock = threading.Lock()
+
+
+def month_day_ms(month_day):
+    # Brush values are Unix milliseconds on the chart's year-2000 axis
+    return datetime.strptime(f"2000-{month_day}", '%Y-%m-%d').timestamp() * 1000
+
+
+def record_instruments(country, instrument_type, count, seed=0):
+    # Synthetic histories for the first instruments of a country, served by the replay provider
+    options = catalog.load_catalog().options(country, instrument_type)[:min(count, 50)]
+    replay = providers.ReplayProvider()
+    for i, option in enumerate(options):
+        isin = option.split('|')[-1].strip()
+        replay.record(isin, synthetic_prices(HISTORY_YEARS, seed=seed + i, end=f"{LAST_YEAR}-12-31"))
+    return options
+
+
+class Session:
+
+    def __init__(self, rng, think_time, samples):
+        from streamlit.testing.v1 import AppTest
+
+        self.app = AppTest.from_file(APP_SCRIPT, default_timeout=RUN_TIMEOUT)
+        self.rng = rng
+        self.think_time = think_time
+        self.samples = samples
+
+    def rerun(self, action, interact=None):
+        # Time one user action: waiting for the worker, then the rerun itself
+        if self.think_time:
+            time.sleep(self.rng.uniform(0, 2 * self.think_time))
+        requested = time.perf_counter()
+        error = None
+        with _rerun_lock:
+            started = time.perf_counter()
+            try:
+                if interact is not None:
+                    interact(self.app)
+                self.app.run()
+                if len(self.app.exception):
+                    error = self.app.exception[0].message
+            except Exception as e:
+                error = str(e)
+            finished = time.perf_counter()
+        self.samples.append({'action': action, 'latency': finished - requested, 'queued': started - requested,
+                             'error': error})
+
+    def brush(self, start_md, end_md):
+        # The brush is the seasonal chart's selection state
+        def select(app):
+            app.session_state['my_chart'] = {'selection': {'Interval': {'Day_of_Year': [month_day_ms(start_md),
+                                                                                        month_day_ms(end_md)]}}}
+        self.rerun('brush', select)
+
+    def flow(self, country, options, brush_moves):
+        self.rerun('country', lambda app: app.selectbox(key='analyzer country').set_value(country))
+        ticker = options[self.rng.randrange(len(options))]
+        self.rerun('pick', lambda app: app.selectbox(key='analyzer ticker').set_value(ticker))
+        self.rerun('fetch', lambda app: app.button(key='analyzer fetch_button').click())
+        for _ in range(brush_moves):
+            start = self.rng.randrange(0, seasonal.DAYS_IN_YEAR - 60)
+            self.brush(seasonal.MONTH_DAYS[start], seasonal.MONTH_DAYS[start + self.rng.randrange(5, 60)])
+        years = self.rng.sample(range(LAST_YEAR - HISTORY_YEARS + 1, LAST_YEAR + 1), self.rng.randint(1, 3))
+        self.rerun('exclude', lambda app: app.multiselect(key='analyzer exclude_years').set_value(years))
+        self.rerun('fetch', lambda app: app.button(key='analyzer fetch_button').click())
+
+
+def run_worker(worker, sessions, flows, brush_moves, think_time, country, options, seed):
+    # One worker process: `sessions` concurrent sessions, each running `flows` flows
+    samples = []
+    peak_rss = [process_rss()]
+    stopped = threading.Event()
+
+    def sample_rss():
+        while not stopped.wait(RSS_INTERVAL):
+            peak_rss[0] = max(peak_rss[0], process_rss())
+
+    def simulate(index):
+        session = Session(random.Random(seed * 1000 + worker * 100 + index), think_time, samples)
+        session.rerun('load')
+        for _ in range(flows):
+            session.flow(country, options, brush_moves)
+
+    sampler = threading.Thread(target=sample_rss, daemon=True)
+    sampler.start()
+    started = time.perf_counter()
+    threads = [threading.Thread(target=simulate, args=(i,)) for i in range(sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    stopped.set()
+    peak_rss[0] = max(peak_rss[0], process_rss())
+    return {'worker': worker, 'samples': samples, 'elapsed': elapsed, 'peak_rss': peak_rss[0]}
+
+
+def latency_summary(samples):
+    latencies = np.array([sample['latency'] for sample in samples]) * 1000
+    queued = np.array([sample['queued'] for sample in samples]) * 1000
+    summary = {f"p{p}_ms": round(float(np.percentile(latencies, p)), 1) for p in PERCENTILES}
+    summary.update({
+        'mean_ms': round(float(latencies.mean()), 1),
+        'max_ms': round(float(latencies.max()), 1),
+        'mean_queued_ms': round(float(queued.mean()), 1),
+        'reruns': len(samples),
+    })
+    return summary
+
+
+def run_level(workers, sessions, flows, brush_moves, think_time, country, options, seed):
+    # Every worker starts from an empty price store, like a freshly scaled-out replica
+    shutil.rmtree(price_store.STORE_DIR, ignore_errors=True)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_worker, worker, sessions, flows, brush_moves, think_time, country, options, seed)
+                   for worker in range(workers)]
+        results = [future.result() for future in futures]
+    # Measured inside the workers, so process start-up doesn't count against throughput
+    elapsed = max(result['elapsed'] for result in results)
+
+    samples = [sample for result in results for sample in result['samples']]
+    actions = sorted({sample['action'] for sample in samples})
+    return {
+        'workers': workers,
+        'sessions_per_worker': sessions,
+        'elapsed_s': round(elapsed, 2),
+        'throughput_rps': round(len(samples) / elapsed, 2),
+        'errors': sum(sample['error'] is not None for sample in samples),
+        'latency': latency_summary(samples),
+        'actions': {action: latency_summary([s for s in samples if s['action'] == action]) for action in actions},
+        'peak_rss_mb': [round(result['peak_rss'] / 2 ** 20, 1) for result in results],
+    }
+
+
+def print_level(level):
+    latency = level['latency']
+    print(f"workers={level['workers']} sessions/worker={level['sessions_per_worker']}  "
+          f"{latency['reruns']} reruns in {level['elapsed_s']:.1f}s = {level['throughput_rps']:.1f}/s  "
+          f"errors={level['errors']}  peak RSS/worker={max(level['peak_rss_mb']):.0f} MB")
+    print(f"  {'action':<8} {'reruns':>6} " + ' '.join(f"{f'p{p}':>8}" for p in PERCENTILES) + f" {'queued':>8}")
+    for action, summary in [('all', latency)] + sorted(level['actions'].items()):
+        print(f"  {action:<8} {summary['reruns']:6d} "
+              + ' '.join(f"{summary[f'p{p}_ms']:8.0f}" for p in PERCENTILES) + f" {summary['mean_queued_ms']:8.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent-session load test of the Pulse app (offline).")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2], help="Worker process counts to test")
+    parser.add_argument('--sessions', type=int, default=4, help="Concurrent sessions per worker")
+    parser.add_argument('--flows', type=int, default=2, help="Flows per session")
+    parser.add_argument('--brush-moves', type=int, default=4)
+    parser.add_argument('--think-time', type=float, default=0.0, help="Mean pause between actions in seconds")
+    parser.add_argument('--country', default='NETHERLANDS')
+    parser.add_argument('--instrument-type', default='STOCK')
+    parser.add_argument('--instruments', type=int, default=20,
+                        help="Distinct instruments the sessions pick from (at most the picker's 50)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Also write the JSON results here")
+    args = parser.parse_args()
+
+    try:
+        options = record_instruments(args.country, args.instrument_type, args.instruments, args.seed)
+        if not options:
+            parser.error(f"No {args.instrument_type} instruments for {args.country} in the catalog")
+
+        levels = []
+        for workers in args.workers:
+            level = run_level(workers, args.sessions, args.flows, args.brush_moves, args.think_time,
+                              args.country, options, args.seed)
+            print_level(level)
+            levels.append(level)
+    finally:
+        if LOADTEST_DIR:
+            shutil.rmtree(LOADTEST_DIR, ignore_errors=True)
+
+    if args.output:
+        results = {
+            'generated_at': datetime.now().isoformat(timespec='seconds'),
+            'cpus': os.cpu_count(),
+            'settings': vars(args),
+            'levels': levels,
+        }
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+        print(f"Wrote {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+import os
+import json
+import time
+import queue
+import argparse
+import threading
+from collections import Counter
+from datetime import date, datetime, timedelta
+import analysis
+import price_store
+import result_cache
+from instrumentation import span, log_event, log_error, increment
+
+# Background warm-up of the price store and analysis cache. The app records
+# every fetched ISIN here and queues a prefetch as soon as an instrument is
+# picked, so by the time "Fetch Data" is pressed the download has usually
+# happened already. Once a day, after the markets close, the most requested
+# instruments are topped up with the latest bars. A small pool of worker
+# threads does all of this with a bounded queue, a bounded popularity table,
+# and it only adds to the analysis cache while that is below its share.
+PREFETCH_DIR = os.path.join(price_store.DATA_DIR, 'prefetch')
+POPULARITY_FILE = os.path.join(PREFETCH_DIR, 'popularity.json')
+
+ENABLED = os.environ.get('PULSE_PREFETCH', '1') != '0'
+WORKERS = int(os.environ.get('PULSE_PREFETCH_WORKERS', 2))
+QUEUE_SIZE = int(os.environ.get('PULSE_PREFETCH_QUEUE', 64))
+TOP_N = int(os.environ.get('PULSE_PREFETCH_TOP', 50))
+# Local hour after which the daily refresh runs (after the US close for Europe)
+REFRESH_HOUR = int(os.environ.get('PULSE_REFRESH_HOUR', 23))
+# Prefetched analyses stop going into the result cache above this fill ratio
+CACHE_SHARE = float(os.environ.get('PULSE_PREFETCH_CACHE_SHARE', 0.5))
+MAX_TRACKED = 5000
+CHECK_INTERVAL = 300
+
+_prefetcher = None
+_prefetcher_lock = threading.Lock()
+
+
+def load_popularity(path=POPULARITY_FILE):
+    try:
+        with open(path, 'r') as file:
+            state = json.load(file)
+    except (FileNotFoundError, ValueError):
+        return Counter(), None
+    return Counter(state.get('counts', {})), state.get('refreshed_on')
+
+
+def save_popularity(counts, refreshed_on, path=POPULARITY_FILE):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as file:
+        json.dump({'counts': dict(counts), 'refreshed_on': refreshed_on}, file)
+    os.replace(tmp_path, path)
+
+
+def refresh_isin(isin):
+    # Extend an already stored history up to today; new ISINs are left to prefetch
+    meta = price_store.load_meta(isin)
+    if meta is None:
+        return False
+    with span('prefetch_refresh', isin=isin):
+        provider = analysis.provider_for(isin)
+        price_store.get_prices(isin, meta['start'], date.today() + timedelta(days=1), provider.history)
+    return True
+
+
+class Prefetcher:
+
+    def __init__(self, workers=WORKERS, queue_size=QUEUE_SIZE, top_n=TOP_N, refresh_hour=REFRESH_HOUR,
+                 cache_share=CACHE_SHARE, popularity_file=POPULARITY_FILE):
+        self.top_n = top_n
+        self.refresh_hour = refresh_hour
+        self.cache_share = cache_share
+        self.popularity_file = popularity_file
+        self.jobs = queue.Queue(maxsize=queue_size)
+        self.pending = set()
+        self.lock = threading.Lock()
+        self.counts, self.refreshed_on = load_popularity(popularity_file)
+        self.dirty = False
+        self.stopped = threading.Event()
+        self.threads = [threading.Thread(target=self._work, name=f'pulse-prefetch-{i}', daemon=True)
+                        for i in range(workers)]
+        self.threads.append(threading.Thread(target=self._schedule, name='pulse-prefetch-schedule', daemon=True))
+
+    def start(self):
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+
+    def record(self, isin):
+        # One user request for this ISIN; the table keeps only the most requested ones
+        with self.lock:
+            self.counts[isin] += 1
+            if len(self.counts) > MAX_TRACKED:
+                self.counts = Counter(dict(self.counts.most_common(MAX_TRACKED // 2)))
+            self.dirty = True
+
+    def popular(self, n=None):
+        with self.lock:
+            return [isin for isin, _ in self.counts.most_common(n or self.top_n)]
+
+    def _submit(self, job):
+        # Duplicate and overflow jobs are dropped; the user's own fetch still works without them
+        with self.lock:
+            if job[:2] in self.pending:
+                return False
+            try:
+                self.jobs.put_nowait(job)
+            except queue.Full:
+                increment('prefetch_dropped')
+                return False
+            self.pending.add(job[:2])
+        return True
+
+    def prefetch(self, isin, start_date, end_date, exclude_years=()):
+        return self._submit(('prefetch', isin, start_date, end_date, tuple(exclude_years)))
+
+    def refresh(self, isins):
+        return sum(self._submit(('refresh', isin)) for isin in isins)
+
+    def _cache_has_room(self):
+        stats = result_cache.analysis_cache.stats()
+        return stats['bytes'] < min(stats['max_bytes'], stats['memory_budget']) * self.cache_share
+
+    def _run(self, job):
+        if job[0] == 'refresh':
+            refresh_isin(job[1])
+            return
+
+        _, isin, start_date, end_date, exclude_years = job
+        with span('prefetch', isin=isin):
+            if self._cache_has_room():
+                analysis.seasonal_analysis(isin, start_date, end_date, exclude_years)
+            else:
+                # Only warm the price store; the analysis is cheap once the prices are local
+                analysis.fetch_returns(isin, start_date, end_date)
+
+    def _work(self):
+        while not self.stopped.is_set():
+            try:
+                job = self.jobs.get(timeout=1)
+            except queue.Empty:
+                continue
+            try:
+                self._run(job)
+            except Exception as e:
+                log_error('prefetch_failed', job=job[0], isin=job[1], error=str(e))
+            finally:
+                with self.lock:
+                    self.pending.discard(job[:2])
+                self.jobs.task_done()
+
+    def _refresh_due(self, now):
+        return now.hour >= self.refresh_hour and self.refreshed_on != now.date().isoformat()
+
+    def _schedule(self):
+        while not self.stopped.wait(0 if self._refresh_due(datetime.now()) else CHECK_INTERVAL):
+            now = datetime.now()
+            if self._refresh_due(now):
+                queued = self.refresh(self.popular())
+                log_event('prefetch_schedule', queued=queued)
+                with self.lock:
+                    self.refreshed_on = now.date().isoformat()
+                    # Halve the counts every day so popularity follows recent use
+                    self.counts = Counter({isin: count // 2 for isin, count in self.counts.items() if count > 1})
+                    self.dirty = True
+
+            with self.lock:
+                if not self.dirty:
+                    continue
+                counts, refreshed_on, self.dirty = Counter(self.counts), self.refreshed_on, False
+            try:
+                save_popularity(counts, refreshed_on, self.popularity_file)
+            except OSError as e:
+                log_error('prefetch_popularity_save_failed', error=str(e))
+
+
+def get_prefetcher():
+    # Process-wide prefetcher shared by every session, started on first use
+    global _prefetcher
+    if not ENABLED:
+        return None
+    with _prefetcher_lock:
+        if _prefetcher is None:
+            _prefetcher = Prefetcher().start()
+        return _prefetcher
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Top up the stored history of the most requested instruments.")
+    parser.add_argument('--top', type=int, default=TOP_N)
+    parser.add_argument('--isin', action='append', help="Refresh this ISIN as well (repeatable)")
+    args = parser.parse_args()
+
+    counts, _ = load_popularity()
+    isins = list(dict.fromkeys([isin for isin, _ in counts.most_common(args.top)] + (args.isin or [])))
+    started = time.perf_counter()
+    refreshed = 0
+    for isin in isins:
+        try:
+            refreshed += refresh_isin(isin)
+        except Exception as e:
+            print(f"Error refreshing {isin}: {str(e)}")
+    print(f"Refreshed {refreshed} of {len(isins)} instruments in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
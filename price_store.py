@@ -0,0 +1,253 @@
+import os
+import json
+import time
+import threading
+from itertools import chain
+from datetime import date, datetime
+import numpy as np
+import pandas as pd
+import trading_calendar
+
+# On-disk price history store: one Parquet file per instrument plus a small
+# JSON sidecar recording which ticker was used and which date range has already
+# been requested from the remote source. Files are replaced atomically so the
+# store can be shared by every Streamlit session and worker process. Every
+# series is stored with its integer calendar index (see trading_calendar.py).
+DATA_DIR = os.environ.get('PULSE_DATA_DIR', 'data')
+STORE_DIR = os.path.join(DATA_DIR, 'prices')
+
+PRICE_COLUMNS = ['date', 'Open', 'High', 'Low', 'Close', 'Volume']
+# Gaps that came back empty (a holiday, a delisted or suspended instrument)
+# count as covered for this many seconds before they are asked for again
+RECHECK_SECONDS = float(os.environ.get('PULSE_STORE_RECHECK', 6 * 3600))
+
+# One lock per ISIN so concurrent sessions in the same process don't download
+# the same missing range twice
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def lock_for(isin):
+    with _locks_guard:
+        if isin not in _locks:
+            _locks[isin] = threading.Lock()
+        return _locks[isin]
+
+
+def to_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+
+
+def _store_paths(isin):
+    return (os.path.join(STORE_DIR, f"{isin}.parquet"),
+            os.path.join(STORE_DIR, f"{isin}.json"))
+
+
+def _atomic_write(path, write):
+    # Write to a temporary file in the same directory, then rename over the target
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def load_meta(isin):
+    _, meta_path = _store_paths(isin)
+    try:
+        with open(meta_path, 'r') as file:
+            return json.load(file)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def load_prices(isin, columns=None):
+    prices_path, _ = _store_paths(isin)
+    if not os.path.exists(prices_path):
+        return pd.DataFrame(columns=columns or PRICE_COLUMNS)
+    try:
+        return pd.read_parquet(prices_path, columns=columns)
+    except ValueError:
+        # Written before the calendar columns were stored; derive them on the fly
+        if not columns or not set(columns) & set(trading_calendar.CALENDAR_COLUMNS):
+            raise
+        prices = pd.read_parquet(prices_path)
+        return trading_calendar.add_calendar(prices)[columns]
+
+
+def save_prices(isin, prices, meta):
+    os.makedirs(STORE_DIR, exist_ok=True)
+    prices_path, meta_path = _store_paths(isin)
+
+    # Prices go first: if we crash in between, the sidecar still describes a
+    # subset of what is on disk and the next call simply re-fetches the gap
+    prices = trading_calendar.add_calendar(prices)
+    _atomic_write(prices_path, lambda path: prices.to_parquet(path, index=False))
+    save_meta(isin, meta)
+    return prices
+
+
+def save_meta(isin, meta):
+    _, meta_path = _store_paths(isin)
+
+    def write_meta(path):
+        with open(path, 'w') as file:
+            json.dump(meta, file)
+
+    _atomic_write(meta_path, write_meta)
+
+
+def missing_ranges(meta, start, end, include_checked=True):
+    # Date ranges in [start, end) not yet requested from the remote source.
+    # A span recently checked and found empty counts as covered unless
+    # include_checked is False, which gives the gaps next to the stored bars.
+    if meta is None:
+        return [(start, end)]
+
+    covered_start = to_date(meta['start'])
+    covered_end = to_date(meta['end'])
+    checked = meta.get('checked')
+    if include_checked and checked and time.time() - checked['at'] < RECHECK_SECONDS:
+        covered_start = min(covered_start, to_date(checked['start']))
+        covered_end = max(covered_end, to_date(checked['end']))
+    ranges = []
+    if start < covered_start:
+        ranges.append((start, min(end, covered_start)))
+    if end > covered_end:
+        ranges.append((max(start, covered_end), end))
+    return [(s, e) for s, e in ranges if s < e]
+
+
+def stored_version(isin, start_date, end_date):
+    # updated_at stamp if [start_date, end_date) is fully covered, else None
+    meta = load_meta(isin)
+    if meta is None or missing_ranges(meta, to_date(start_date), to_date(end_date)):
+        return None
+    return meta.get('updated_at')
+
+
+def store_version():
+    # Changes whenever any instrument is written, as every write renames a file into the store
+    try:
+        return os.stat(STORE_DIR).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def normalize(ticker_data):
+    # Flatten a yf.download result into the store's column layout
+    if ticker_data is None or ticker_data.empty:
+        return pd.DataFrame(columns=PRICE_COLUMNS)
+
+    ticker_data = ticker_data.copy()
+    if isinstance(ticker_data.columns, pd.MultiIndex):
+        ticker_data.columns = ticker_data.columns.get_level_values(0)
+    # Daily bars are indexed by 'Date', intraday bars by 'Datetime'
+    ticker_data = ticker_data.reset_index().rename(columns={'Date': 'date', 'Datetime': 'date'})
+    ticker_data['date'] = pd.to_datetime(ticker_data['date']).dt.tz_localize(None)
+    return ticker_data[[c for c in PRICE_COLUMNS if c in ticker_data.columns]]
+
+
+def _settled(gap_start, gap_end):
+    # An empty answer only proves there was nothing to fetch when the gap has
+    # no weekday in it; anything longer may be a swallowed network error
+    return np.busday_count(gap_start, gap_end) == 0
+
+
+def merge_prices(isin, ticker, meta, prices, fetched):
+    # Append freshly downloaded frames to the stored history; `fetched` holds
+    # (gap_start, gap_end, frame) per requested gap. The covered range only
+    # grows over gaps that returned bars (or had no weekday in them), so a
+    # failed download is retried next time. The caller holds the ISIN lock.
+    frames = [frame for _, _, frame in fetched if not frame.empty]
+    if frames:
+        prices = pd.concat([prices, *frames]) if not prices.empty else pd.concat(frames)
+        prices = (prices.drop_duplicates(subset='date', keep='last')
+                        .sort_values('date')
+                        .reset_index(drop=True))
+
+    # Today's bar may still be moving, so only mark completed days as covered
+    last_complete = date.today()
+    covered = (to_date(meta['start']), to_date(meta['end'])) if meta else None
+    for gap_start, gap_end, frame in sorted(fetched, key=lambda gap: gap[0]):
+        if frame.empty and not _settled(gap_start, gap_end):
+            continue
+        gap_end = max(gap_start, min(gap_end, last_complete))
+        if covered is None:
+            covered = (gap_start, gap_end)
+        elif gap_start <= covered[1] and gap_end >= covered[0]:
+            covered = (min(covered[0], gap_start), max(covered[1], gap_end))
+
+    if covered is None:
+        # Nothing found yet, so there is nothing to record
+        return prices
+
+    # Empty gaps that weren't covered are remembered as checked, so they
+    # aren't asked for again on every request until RECHECK_SECONDS pass
+    empty = [(gap_start, gap_end) for gap_start, gap_end, frame in fetched
+             if frame.empty and (gap_start < covered[0] or gap_end > covered[1])]
+    checked = ({'start': min(g[0] for g in empty).isoformat(), 'end': max(g[1] for g in empty).isoformat(),
+                'at': time.time()} if empty else None)
+
+    meta_update = {
+        'ticker': ticker,
+        'start': covered[0].isoformat(),
+        'end': covered[1].isoformat(),
+        # Data and coverage unchanged: keep the stamp, so cached analyses stay valid
+        'updated_at': datetime.now().isoformat() if frames or meta is None
+                      or covered != (to_date(meta['start']), to_date(meta['end'])) else meta['updated_at'],
+    }
+    if checked:
+        meta_update['checked'] = checked
+    if not frames:
+        save_meta(isin, meta_update)
+        return prices
+    return save_prices(isin, prices, meta_update)
+
+
+def get_prices(isin, start_date, end_date, download, fallback_tickers=()):
+    # Return stored prices for [start_date, end_date), fetching only what is missing.
+    # `download(ticker, start, end)` hits the remote source; `fallback_tickers` are
+    # consumed lazily, in order, when the ISIN itself returns nothing on the first fetch.
+    start = to_date(start_date)
+    end = to_date(end_date)
+
+    with lock_for(isin):
+        meta = load_meta(isin)
+        prices = load_prices(isin)
+        if missing_ranges(meta, start, end):
+            # Something is missing, so ask for every gap next to the stored bars
+            gaps = missing_ranges(meta, start, end, include_checked=False)
+            fetched = []
+            ticker = meta['ticker'] if meta else None
+
+            for gap_start, gap_end in gaps:
+                if ticker is None:
+                    # First fetch for this ISIN: resolve which ticker the source knows
+                    for candidate in chain((isin,), fallback_tickers):
+                        ticker_data = normalize(download(candidate, gap_start, gap_end))
+                        if not ticker_data.empty:
+                            ticker = candidate
+                            break
+                else:
+                    ticker_data = normalize(download(ticker, gap_start, gap_end))
+                fetched.append((gap_start, gap_end, ticker_data))
+
+            if ticker is None:
+                # Nothing found under any ticker; don't record coverage so we retry later
+                return pd.DataFrame(columns=PRICE_COLUMNS)
+
+            prices = merge_prices(isin, ticker, meta, prices, fetched)
+
+    if prices.empty:
+        return prices
+
+    dates = pd.to_datetime(prices['date'])
+    mask = (dates >= pd.Timestamp(start)) & (dates < pd.Timestamp(end))
+    return prices[mask].reset_index(drop=True)
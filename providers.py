@@ -0,0 +1,266 @@
+import os
+import argparse
+import threading
+import pandas as pd
+import catalog
+import price_store
+from instrumentation import span, log_event
+
+# Market data sources behind one small interface:
+#
+#   history(ticker, start, end, interval)        bars in [start, end) in the
+#                                                price store's column layout
+#   batch_history(tickers, start, end, interval) {ticker: bars} for many tickers
+#   resolve(isin)                                other tickers the source may
+#                                                list the ISIN under, tried
+#                                                lazily when the ISIN itself
+#                                                returns nothing
+#
+# 'yfinance' downloads through one pooled HTTP session per process with
+# timeouts and retries on transient errors. 'replay' serves bars recorded in
+# PULSE_REPLAY_DIR, so the app, the benchmarks and load tests run offline at
+# full speed; with PULSE_RECORD=1 every response from the live source is also
+# written there. PULSE_PROVIDER selects the source, and an instrument type
+# can be routed to its own source with e.g. PULSE_PROVIDER_CRYPTO=replay.
+PROVIDER = os.environ.get('PULSE_PROVIDER', 'yfinance')
+INSTRUMENT_TYPES = ('STOCK', 'ETF', 'CURRENCY', 'CRYPTO')
+TYPE_PROVIDERS = {instrument_type: os.environ[f'PULSE_PROVIDER_{instrument_type}']
+                  for instrument_type in INSTRUMENT_TYPES if os.environ.get(f'PULSE_PROVIDER_{instrument_type}')}
+REPLAY_DIR = os.environ.get('PULSE_REPLAY_DIR', os.path.join(price_store.DATA_DIR, 'replay'))
+RECORD = os.environ.get('PULSE_RECORD') == '1'
+# Seconds to wait for a connection / a response from the remote source
+TIMEOUT = float(os.environ.get('PULSE_PROVIDER_TIMEOUT', 20))
+POOL_SIZE = int(os.environ.get('PULSE_PROVIDER_POOL', 16))
+RETRIES = 2
+
+_providers = {}
+_providers_lock = threading.Lock()
+
+
+def _window(frame, start_date, end_date):
+    if frame.empty:
+        return frame
+    dates = pd.to_datetime(frame['date'])
+    start, end = pd.Timestamp(price_store.to_date(start_date)), pd.Timestamp(price_store.to_date(end_date))
+    return frame[(dates >= start) & (dates < end)].reset_index(drop=True)
+
+
+class Provider:
+    name = None
+
+    def history(self, ticker, start_date, end_date, interval='1d'):
+        raise NotImplementedError
+
+    def batch_history(self, tickers, start_date, end_date, interval='1d', threads=8):
+        # One request per ticker unless the source can batch them
+        frames = {}
+        for ticker in tickers:
+            ticker_data = self.history(ticker, start_date, end_date, interval)
+            if not ticker_data.empty:
+                frames[ticker] = ticker_data
+        return frames
+
+    def resolve(self, isin):
+        # The exchange symbol from the catalog, for sources that don't list the ISIN
+        stock_info = catalog.load_catalog().lookup(isin)
+        if stock_info is None or not isinstance(stock_info['symbol'], str):
+            log_event('symbol_fallback', isin=isin, symbol=None)
+            return
+        symbol = stock_info['symbol'].strip()
+        log_event('symbol_fallback', isin=isin, symbol=symbol)
+        yield symbol
+
+
+class YFinanceProvider(Provider):
+    name = 'yfinance'
+
+    def __init__(self, timeout=TIMEOUT, pool_size=POOL_SIZE, retries=RETRIES):
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.retries = retries
+        self._session = None
+        # yf.download keeps its results in module-level state, so only one
+        # batch download runs at a time (each gets its concurrency from
+        # yfinance's own threads); single-ticker history doesn't touch that state
+        self.lock = threading.Lock()
+        self._session_lock = threading.Lock()
+
+    def session(self):
+        # Created on first use, so yfinance and requests are only imported when something is downloaded
+        with self._session_lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                from urllib3.util.retry import Retry
+
+                session = requests.Session()
+                retry = Retry(total=self.retries, backoff_factor=0.5, status_forcelist=(500, 502, 503, 504),
+                              allowed_methods=('GET',))
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_size, max_retries=retry)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                self._session = session
+            return self._session
+
+    def history(self, ticker, start_date, end_date, interval='1d'):
+        import yfinance as yf
+
+        with span('download', ticker=ticker, start=start_date, end=end_date, interval=interval):
+            ticker_data = yf.Ticker(ticker, session=self.session()).history(
+                start=start_date.strftime('%Y-%m-%d'),
+                end=end_date.strftime('%Y-%m-%d'),
+                interval=interval,
+                auto_adjust=True,  # Use adjusted prices by default
+                actions=False,
+                timeout=self.timeout,
+            )
+            return price_store.normalize(ticker_data)
+
+    def batch_history(self, tickers, start_date, end_date, interval='1d', threads=8):
+        import yfinance as yf
+
+        with span('download_batch', tickers=len(tickers), start=start_date, end=end_date, interval=interval):
+            with self.lock:
+                data = yf.download(
+                    tickers=list(tickers),
+                    start=start_date.strftime('%Y-%m-%d'),
+                    end=end_date.strftime('%Y-%m-%d'),
+                    interval=interval,
+                    progress=False,
+                    auto_adjust=True,  # Use adjusted prices by default
+                    timeout=self.timeout,
+                    session=self.session(),
+                    group_by='ticker',
+                    threads=threads,
+                )
+
+        # Split the (ticker, field) column frame into one frame per ticker
+        frames = {}
+        if data is None or data.empty:
+            return frames
+        for ticker in tickers:
+            if ticker not in data.columns.get_level_values(0):
+                continue
+            ticker_data = data[ticker].dropna(how='all')
+            if not ticker_data.empty:
+                frames[ticker] = price_store.normalize(ticker_data)
+        return frames
+
+
+class ReplayProvider(Provider):
+    # Bars recorded as '<directory>/<interval>/<ticker>.parquet'; unknown tickers return nothing
+    name = 'replay'
+
+    def __init__(self, directory=REPLAY_DIR):
+        self.directory = directory
+        self.lock = threading.Lock()
+
+    def path(self, ticker, interval='1d'):
+        return os.path.join(self.directory, interval, f"{ticker}.parquet")
+
+    def load(self, ticker, interval='1d'):
+        try:
+            return pd.read_parquet(self.path(ticker, interval))
+        except FileNotFoundError:
+            return pd.DataFrame(columns=price_store.PRICE_COLUMNS)
+
+    def history(self, ticker, start_date, end_date, interval='1d'):
+        with span('replay', ticker=ticker, start=start_date, end=end_date, interval=interval):
+            return _window(self.load(ticker, interval), start_date, end_date)
+
+    def record(self, ticker, bars, interval='1d'):
+        # Merge bars into the recording, newest values winning
+        if bars is None or bars.empty:
+            return
+        path = self.path(ticker, interval)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self.lock:
+            bars = bars[[c for c in price_store.PRICE_COLUMNS if c in bars.columns]]
+            recorded = self.load(ticker, interval)
+            if not recorded.empty:
+                bars = pd.concat([recorded, bars])
+            bars = bars.drop_duplicates(subset='date', keep='last').sort_values('date').reset_index(drop=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            bars.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, path)
+
+
+class RecordingProvider(Provider):
+    # Passes requests on to a live source and keeps every response for replay
+    name = 'record'
+
+    def __init__(self, source, replay):
+        self.source = source
+        self.replay = replay
+
+    def history(self, ticker, start_date, end_date, interval='1d'):
+        bars = self.source.history(ticker, start_date, end_date, interval)
+        self.replay.record(ticker, bars, interval)
+        return bars
+
+    def batch_history(self, tickers, start_date, end_date, interval='1d', threads=8):
+        frames = self.source.batch_history(tickers, start_date, end_date, interval, threads)
+        for ticker, bars in frames.items():
+            self.replay.record(ticker, bars, interval)
+        return frames
+
+    def resolve(self, isin):
+        return self.source.resolve(isin)
+
+
+PROVIDERS = {
+    'yfinance': YFinanceProvider,
+    'replay': ReplayProvider,
+}
+
+
+def get_provider(instrument_type=None):
+    # Process-wide provider for an instrument type (or the default source)
+    name = TYPE_PROVIDERS.get((instrument_type or '').upper(), PROVIDER)
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown market data provider '{name}'")
+    with _providers_lock:
+        if name not in _providers:
+            provider = PROVIDERS[name]()
+            if RECORD and name != 'replay':
+                provider = RecordingProvider(provider, ReplayProvider())
+            _providers[name] = provider
+        return _providers[name]
+
+
+def export_store(isins=None, directory=REPLAY_DIR):
+    # Copy stored histories into a replay directory under the ticker they were fetched with
+    replay = ReplayProvider(directory)
+    exported = 0
+    stored = os.listdir(price_store.STORE_DIR) if os.path.isdir(price_store.STORE_DIR) else []
+    keys = isins or sorted(name[:-len('.json')] for name in stored if name.endswith('.json'))
+    for key in keys:
+        meta = price_store.load_meta(key)
+        if meta is None:
+            continue
+        # Intraday histories are stored as '<ISIN>.<interval>' and replayed
+        # under the ticker of the ISIN's daily history, like fetch_intraday asks for them
+        ticker, interval = meta['ticker'], '1d'
+        if '.' in key:
+            isin, interval = key.split('.', 1)
+            daily_meta = price_store.load_meta(isin)
+            if daily_meta is None:
+                continue
+            ticker = daily_meta['ticker']
+        replay.record(ticker, price_store.load_prices(key), interval)
+        exported += 1
+    return exported
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record stored price histories for the offline replay provider.")
+    parser.add_argument('--isin', action='append', help="Only export this ISIN (repeatable; default: the whole store)")
+    parser.add_argument('--output', default=REPLAY_DIR, help="Replay directory to write to")
+    args = parser.parse_args()
+
+    exported = export_store(args.isin, args.output)
+    print(f"Exported {exported} histories to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+import sys
+import json
+import argparse
+import contextlib
+from datetime import date, datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import analysis
+import backtest
+import instrumentation
+import resolutions
+import result_cache
+import seasonal
+import significance
+
+# Command line and HTTP/JSON front end for the headless analysis in analysis.py:
+#
+#   python pulse.py seasonal NL0011821202 --window 03-01:04-15 --json
+#   python pulse.py seasonal NL0011821202 --window 03-01:04-15 --resamples 10000
+#   python pulse.py backtest NL0011821202 --max-hold 45 --top 10
+#   python pulse.py profile NL0011821202 --resolution trading_day_of_month
+#   python pulse.py overlay NL0011821202 NL0000009165 NL0000008977
+#   python pulse.py serve --port 8600
+#   curl 'localhost:8600/seasonal?isin=NL0011821202&window=03-01:04-15&exclude=2008,2020'
+#   curl localhost:8600/metrics   (Prometheus text format)
+DEFAULT_START = '1900-01-01'
+
+
+def parse_window(value):
+    if not value:
+        return None
+    return seasonal.parse_window(value)
+
+
+def parse_date(value, default):
+    return datetime.strptime(value, '%Y-%m-%d') if value else default
+
+
+def run_report(isin, start=None, end=None, exclude_years=(), window=None, curve=True, resamples=0):
+    return analysis.seasonal_report(
+        isin,
+        parse_date(start, datetime.strptime(DEFAULT_START, '%Y-%m-%d')),
+        parse_date(end, datetime.combine(date.today(), datetime.min.time())),
+        exclude_years,
+        window=parse_window(window),
+        curve=curve,
+        resamples=resamples,
+    )
+
+
+def run_backtest(isin, start=None, end=None, exclude_years=(), **options):
+    return analysis.backtest_report(
+        isin,
+        parse_date(start, datetime.strptime(DEFAULT_START, '%Y-%m-%d')),
+        parse_date(end, datetime.combine(date.today(), datetime.min.time())),
+        exclude_years,
+        **options,
+    )
+
+
+def run_profile(isin, start=None, end=None, exclude_years=(), resolution='month'):
+    return analysis.resolution_report(
+        isin,
+        parse_date(start, datetime.strptime(DEFAULT_START, '%Y-%m-%d')),
+        parse_date(end, datetime.combine(date.today(), datetime.min.time())),
+        exclude_years,
+        resolution,
+    )
+
+
+def run_overlay(isins, start=None, end=None, exclude_years=()):
+    return analysis.overlay_report(
+        isins,
+        parse_date(start, datetime.strptime(DEFAULT_START, '%Y-%m-%d')),
+        parse_date(end, datetime.combine(date.today(), datetime.min.time())),
+        exclude_years,
+    )
+
+
+def _percent(value):
+    # Metrics are None (JSON) or NaN when the window has no years with data
+    if value is None or value != value:
+        return f"{'n/a':>9}"
+    return f"{value * 100:8.2f}%"
+
+
+def print_report(report):
+    metrics = report['metrics']
+    print(f"{report['isin']}  {report['earliest_date']} to {report['latest_date']}  "
+          f"pattern {report['window']['start']} to {report['window']['end']}")
+    print(f"  Maximum Pattern Growth      {_percent(metrics['max'])}")
+    print(f"  Maximum Pattern Drawdown    {_percent(metrics['min'])}")
+    print(f"  Average Pattern Return      {_percent(metrics['mean'])}")
+    print(f"  Cumulative Pattern Return   {_percent(metrics['cumulative'])}")
+    print(f"  Positive Returns            {metrics['positive']:8d}")
+    print(f"  Negative Returns            {metrics['negative']:8d}")
+    print(f"  Positive / Negative Ratio % {_percent(metrics['ratio'])}")
+    tests = report.get('significance')
+    if tests:
+        level = f"{tests['confidence'] * 100:.0f}%"
+        print(f"  Significance over {tests['resamples']} resamples and {tests['years']} years")
+        print(f"  Average Return {level} CI      {tests['mean_ci'][0] * 100:8.2f}% to {tests['mean_ci'][1] * 100:.2f}%")
+        print(f"  Hit Rate {level} CI            {tests['hit_rate_ci'][0] * 100:8.2f}% to {tests['hit_rate_ci'][1] * 100:.2f}%")
+        if tests['p_mean'] is not None:
+            print(f"  p, mean vs random windows   {tests['p_mean']:9.4f}")
+            print(f"  p, hit rate vs random       {tests['p_hit_rate']:9.4f}")
+        print(f"  p, mean vs zero (sign flip) {tests['p_sign']:9.4f}")
+
+
+def print_backtest(report):
+    print(f"{report['isin']}  {report['earliest_date']} to {report['latest_date']}  best windows by {report['metric']}")
+    print(f"  {'Entry':>5}  {'Exit':>5}  {'Hold':>4}  {'Years':>5}  {'Hit':>7}  {'Mean':>7}  {'Median':>7}  "
+          f"{'Worst':>7}  {'OOS':>7}  {'Trades':>6}")
+    for window in report['windows']:
+        print(f"  {window['entry']:>5}  {window['exit']:>5}  {window['hold']:4d}  {window['years']:5d}  "
+              f"{window['hit_rate'] * 100:6.1f}%  {window['mean'] * 100:6.2f}%  {window['median'] * 100:6.2f}%  "
+              f"{window['worst'] * 100:6.2f}%  {window['oos_score'] * 100:6.2f}%  {window['oos_trades']:6d}")
+
+
+def print_profile(report):
+    print(f"{report['isin']}  {resolutions.RESOLUTIONS[report['resolution']]}")
+    print(f"  {'':>6}  {'Mean':>8}  {'Median':>8}  {'Hit':>6}  {'Obs':>6}")
+    for bucket in report['buckets']:
+        print(f"  {bucket['label']:>6}  {bucket['mean'] * 100:7.3f}%  {bucket['median'] * 100:7.3f}%  "
+              f"{bucket['hit_rate'] * 100:5.1f}%  {bucket['observations']:6d}")
+
+
+def print_overlay(overlay):
+    # Growth of $100 over the average year, then the seasonal correlation matrix
+    instruments = overlay['instruments']
+    print(f"{'':14}{'Growth':>10}  " + ' '.join(f"{instrument['isin']:>12}" for instrument in instruments))
+    for instrument, row in zip(instruments, overlay['correlation']):
+        print(f"{instrument['isin']:14}{instrument['growth']:10.2f}  "
+              + ' '.join(f"{value:12.2f}" if value is not None else f"{'-':>12}" for value in row))
+    print(f"{'Basket':14}{overlay['basket_growth']:10.2f}")
+    if overlay['missing']:
+        print(f"No data for: {', '.join(overlay['missing'])}")
+
+
+class AnalysisHandler(BaseHTTPRequestHandler):
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+
+        if url.path == '/health':
+            return self._send_json(200, {'status': 'ok'})
+        if url.path == '/stats':
+            return self._send_json(200, result_cache.analysis_cache.stats())
+        if url.path == '/metrics':
+            cache_stats = result_cache.analysis_cache.stats()
+            gauges = {f"analysis_cache_{name}": value for name, value in cache_stats.items()}
+            gauges['process_resident_bytes'] = instrumentation.process_rss()
+            body = instrumentation.render_prometheus(gauges).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        if url.path != '/seasonal':
+            return self._send_json(404, {'error': f"Unknown path {url.path}"})
+        if 'isin' not in params:
+            return self._send_json(400, {'error': "Missing 'isin' parameter"})
+
+        try:
+            exclude_years = [int(year) for year in params.get('exclude', '').split(',') if year]
+            with instrumentation.span('http_seasonal', isin=params['isin']):
+                report = run_report(params['isin'], params.get('start'), params.get('end'), exclude_years,
+                                    params.get('window'), curve=params.get('curve', '1') != '0',
+                                    resamples=int(params.get('resamples', 0)))
+        except (ValueError, KeyError) as e:
+            return self._send_json(400, {'error': str(e)})
+        except Exception as e:
+            # Details stay in the log; the client only learns that the request failed
+            instrumentation.log_error('http_seasonal_failed', isin=params['isin'], error=repr(e))
+            return self._send_json(500, {'error': 'internal error'})
+
+        if report is None:
+            return self._send_json(404, {'error': f"No data found for ISIN: {params['isin']}"})
+        self._send_json(200, report)
+
+
+def serve(host, port):
+    server = ThreadingHTTPServer((host, port), AnalysisHandler)
+    print(f"Serving Pulse analysis on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='pulse', description="Headless Pulse seasonal analysis.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    seasonal_parser = commands.add_parser('seasonal', help="Seasonal pattern metrics for one instrument")
+    seasonal_parser.add_argument('isin')
+    seasonal_parser.add_argument('--window', help="MM-DD:MM-DD day-of-year window (default: whole year)")
+    seasonal_parser.add_argument('--start', help=f"Data from, YYYY-MM-DD (default {DEFAULT_START})")
+    seasonal_parser.add_argument('--end', help="Data to, YYYY-MM-DD (default today)")
+    seasonal_parser.add_argument('--exclude-year', type=int, action='append', default=[])
+    seasonal_parser.add_argument('--json', action='store_true', help="Print the full report as JSON")
+    seasonal_parser.add_argument('--no-curve', action='store_true', help="Leave the average curve out of the JSON")
+    seasonal_parser.add_argument('--resamples', type=int, default=0,
+                                 help=f"Add p-values and confidence intervals from this many resamples (e.g. {significance.RESAMPLES})")
+
+    backtest_parser = commands.add_parser('backtest', help="Best seasonal windows from a full entry/holding sweep")
+    backtest_parser.add_argument('isin')
+    backtest_parser.add_argument('--start', help=f"Data from, YYYY-MM-DD (default {DEFAULT_START})")
+    backtest_parser.add_argument('--end', help="Data to, YYYY-MM-DD (default today)")
+    backtest_parser.add_argument('--exclude-year', type=int, action='append', default=[])
+    backtest_parser.add_argument('--max-hold', type=int, default=backtest.MAX_HOLD, help="Longest holding period in days")
+    backtest_parser.add_argument('--metric', choices=backtest.METRICS, default='oos_score')
+    backtest_parser.add_argument('--top', type=int, default=20)
+    backtest_parser.add_argument('--min-years', type=int, default=10)
+    backtest_parser.add_argument('--json', action='store_true', help="Print the result as JSON")
+
+    profile_parser = commands.add_parser('profile', help="Seasonality by day of week, week, month, trading day or hour")
+    profile_parser.add_argument('isin')
+    profile_parser.add_argument('--resolution', choices=list(resolutions.RESOLUTIONS), default='month')
+    profile_parser.add_argument('--start', help=f"Data from, YYYY-MM-DD (default {DEFAULT_START})")
+    profile_parser.add_argument('--end', help="Data to, YYYY-MM-DD (default today)")
+    profile_parser.add_argument('--exclude-year', type=int, action='append', default=[])
+    profile_parser.add_argument('--json', action='store_true', help="Print the result as JSON")
+
+    overlay_parser = commands.add_parser('overlay', help="Seasonal overlay and correlations of several instruments")
+    overlay_parser.add_argument('isins', nargs='+')
+    overlay_parser.add_argument('--start', help=f"Data from, YYYY-MM-DD (default {DEFAULT_START})")
+    overlay_parser.add_argument('--end', help="Data to, YYYY-MM-DD (default today)")
+    overlay_parser.add_argument('--exclude-year', type=int, action='append', default=[])
+    overlay_parser.add_argument('--json', action='store_true', help="Print the result as JSON")
+
+    serve_parser = commands.add_parser('serve', help="Serve the analysis as an HTTP/JSON endpoint")
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=8600)
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'serve':
+        serve(args.host, args.port)
+        return 0
+
+    if args.command == 'backtest':
+        with contextlib.redirect_stdout(sys.stderr):
+            report = run_backtest(args.isin, args.start, args.end, args.exclude_year, max_hold=args.max_hold,
+                                  metric=args.metric, top=args.top, min_years=args.min_years)
+        if report is None:
+            print(f"No data found for ISIN: {args.isin}", file=sys.stderr)
+            return 1
+        if args.json:
+            print(json.dumps(report, indent=2))
+        else:
+            print_backtest(report)
+        return 0
+
+    if args.command == 'profile':
+        with contextlib.redirect_stdout(sys.stderr):
+            report = run_profile(args.isin, args.start, args.end, args.exclude_year, args.resolution)
+        if report is None:
+            print(f"No data found for ISIN: {args.isin}", file=sys.stderr)
+            return 1
+        if args.json:
+            print(json.dumps(report, indent=2))
+        else:
+            print_profile(report)
+        return 0
+
+    if args.command == 'overlay':
+        with contextlib.redirect_stdout(sys.stderr):
+            overlay = run_overlay(args.isins, args.start, args.end, args.exclude_year)
+        if overlay is None:
+            print("No data found for any of the ISINs", file=sys.stderr)
+            return 1
+        if args.json:
+            print(json.dumps(overlay, indent=2))
+        else:
+            print_overlay(overlay)
+        return 0
+
+    # Fetch progress goes to stderr so --json output stays machine-readable
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            report = run_report(args.isin, args.start, args.end, args.exclude_year, args.window, curve=not args.no_curve,
+                                resamples=args.resamples)
+    except ValueError as e:
+        parser.error(str(e))
+    if report is None:
+        print(f"No data found for ISIN: {args.isin}", file=sys.stderr)
+        return 1
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+import numpy as np
+import pandas as pd
+from trading_calendar import calendar
+
+# Seasonality at other scales than the day of the year. Every profile is a
+# vectorized pass over the stored price series: daily returns are grouped
+# directly (day of week, trading day of month) or compounded into weekly or
+# monthly periods first with np.add.reduceat over consecutive runs of dates.
+# Hour of day works the same way on hourly bars. Each bucket reports the mean
+# and median period return, the hit rate and the number of observations.
+RESOLUTIONS = {
+    'day_of_week': 'Day of Week',
+    'week_of_year': 'Week of Year',
+    'month': 'Month of Year',
+    'trading_day_of_month': 'Trading Day of Month',
+    'trading_day_of_year': 'Trading Day of Year',
+    'hour': 'Hour of Day',
+}
+WEEKDAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+
+def _runs(keys):
+    # Start offsets of the runs of equal consecutive rows in a 2-D key array
+    if not len(keys):
+        return np.array([], dtype=int)
+    changed = (keys[1:] != keys[:-1]).any(axis=1)
+    return np.concatenate([[0], np.flatnonzero(changed) + 1])
+
+
+def _compound(log_returns, keys):
+    # Compounded return of every run of equal keys, with the key row of each run
+    starts = _runs(keys)
+    if not len(starts):
+        return np.array([]), keys
+    return np.expm1(np.add.reduceat(log_returns, starts)), keys[starts]
+
+
+def summarize(buckets, returns, labels=None):
+    # Per-bucket mean, median, hit rate and count of period returns, grouped
+    # with integer bincounts; medians come from one sort by (bucket, return)
+    values, codes = np.unique(buckets, return_inverse=True)
+    counts = np.bincount(codes, minlength=len(values))
+    order = np.lexsort((returns, codes))
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    ordered = returns[order]
+    median = (ordered[starts + (counts - 1) // 2] + ordered[starts + counts // 2]) / 2
+
+    profile = pd.DataFrame({
+        'bucket': values,
+        'mean': np.bincount(codes, weights=returns, minlength=len(values)) / counts,
+        'median': median,
+        'hit_rate': np.bincount(codes, weights=returns > 0, minlength=len(values)) / counts,
+        'observations': counts,
+    })
+    profile.insert(1, 'label', profile['bucket'].map(labels) if labels is not None else profile['bucket'].astype(str))
+    return profile
+
+
+def _daily(prices, exclude_years):
+    # Dates, simple and log daily returns with excluded years dropped
+    dates = pd.DatetimeIndex(prices['date'])
+    returns = prices['daily_return'].to_numpy(dtype=float)
+    keep = ~np.isin(dates.year, list(exclude_years)) if len(exclude_years) else np.ones(len(dates), dtype=bool)
+    return dates[keep], returns[keep], np.log1p(returns[keep])
+
+
+def trading_day_of_year(prices, exclude_years=()):
+    # Nth session of the year on the instrument's exchange, from the stored calendar index
+    years, _, trading_day = calendar(prices)
+    returns = prices['daily_return'].to_numpy(dtype=float)
+    keep = ~np.isin(years, list(exclude_years)) if len(exclude_years) else np.ones(len(years), dtype=bool)
+    return summarize(trading_day[keep].astype(int) + 1, returns[keep])
+
+
+def day_of_week(prices, exclude_years=()):
+    dates, returns, _ = _daily(prices, exclude_years)
+    return summarize(dates.dayofweek.to_numpy(), returns, dict(enumerate(WEEKDAYS)))
+
+
+def week_of_year(prices, exclude_years=()):
+    dates, _, log_returns = _daily(prices, exclude_years)
+    calendar = dates.isocalendar()
+    keys = np.column_stack([calendar['year'].to_numpy(dtype=int), calendar['week'].to_numpy(dtype=int)])
+    weekly, weeks = _compound(log_returns, keys)
+    return summarize(weeks[:, 1], weekly, {week: f"W{week:02d}" for week in range(1, 54)})
+
+
+def month(prices, exclude_years=()):
+    dates, _, log_returns = _daily(prices, exclude_years)
+    keys = np.column_stack([dates.year.to_numpy(), dates.month.to_numpy()])
+    monthly, months = _compound(log_returns, keys)
+    return summarize(months[:, 1], monthly, {i + 1: name for i, name in enumerate(MONTHS)})
+
+
+def trading_day_of_month(prices, exclude_years=()):
+    # Position within the month: +1, +2, ... for the first half, ..., -2, -1
+    # for the second half, so the turn of the month lines up across months
+    dates, returns, _ = _daily(prices, exclude_years)
+    keys = np.column_stack([dates.year.to_numpy(), dates.month.to_numpy()])
+    starts = _runs(keys)
+    stops = np.append(starts[1:], len(keys))
+    run = np.repeat(np.arange(len(starts)), stops - starts)
+    from_start = np.arange(len(keys)) - starts[run] + 1
+    from_end = np.arange(len(keys)) - stops[run]
+    length = (stops - starts)[run]
+    buckets = np.where(from_start <= (length + 1) // 2, from_start, from_end)
+    labels = {day: f"+{day}" if day > 0 else str(day) for day in np.unique(buckets).tolist()}
+    return summarize(buckets, returns, labels)
+
+
+def hour(bars, exclude_years=()):
+    # Open-to-close return of each hourly bar, bucketed by the exchange-local hour
+    dates = pd.DatetimeIndex(bars['date'])
+    returns = (bars['Close'] / bars['Open'] - 1).to_numpy(dtype=float)
+    keep = np.isfinite(returns)
+    if len(exclude_years):
+        keep &= ~np.isin(dates.year, list(exclude_years))
+    hours = dates.hour.to_numpy()[keep]
+    return summarize(hours, returns[keep], {h: f"{h:02d}:00" for h in range(24)})
+
+
+PROFILES = {
+    'day_of_week': day_of_week,
+    'week_of_year': week_of_year,
+    'month': month,
+    'trading_day_of_month': trading_day_of_month,
+    'trading_day_of_year': trading_day_of_year,
+    'hour': hour,
+}
@@ -0,0 +1,237 @@
+import os
+import sys
+import time
+import pickle
+import hashlib
+import contextlib
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from instrumentation import process_rss, log_error
+
+# Process-wide cache for computed seasonal analyses, shared by every session.
+# Entries are evicted least-recently-used once the memory budget is exceeded,
+# expire after a TTL, and are tagged with the price store's updated_at stamp
+# for the instrument so a newer download invalidates them. An optional disk
+# tier lets separate worker processes share results. Sessions only keep keys
+# into this cache, so it is the one place computed data lives; PULSE_MEMORY_MB
+# additionally caps the whole process: the cache gets what is left of it above
+# the process' resident memory when the cache is created.
+CACHE_MB = float(os.environ.get('PULSE_CACHE_MB', 256))
+MEMORY_MB = float(os.environ.get('PULSE_MEMORY_MB', 0))
+CACHE_TTL = float(os.environ.get('PULSE_CACHE_TTL', 6 * 3600))
+# e.g. PULSE_CACHE_DIR=data/results
+CACHE_DIR = os.environ.get('PULSE_CACHE_DIR') or None
+# The disk tier drops entries older than the TTL and, least recently used
+# first, whatever exceeds this size; checked at most every PRUNE_INTERVAL seconds
+CACHE_DIR_MB = float(os.environ.get('PULSE_CACHE_DIR_MB', 1024))
+PRUNE_INTERVAL = 300
+
+
+def estimate_size(value):
+    # Rough in-memory footprint; arrays and frames dominate, everything else is small
+    if isinstance(value, np.memmap):
+        # File-backed pages are shared between processes and reclaimable
+        return sys.getsizeof(value)
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=False).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=False))
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    if hasattr(value, '__dict__'):
+        return sys.getsizeof(value) + estimate_size(vars(value))
+    return sys.getsizeof(value)
+
+
+class ResultCache:
+
+    def __init__(self, max_bytes, ttl, directory=None, memory_limit=0, disk_max_bytes=0):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.directory = directory
+        self.disk_max_bytes = disk_max_bytes
+        self.pruned_at = 0.0
+        self.prune_lock = threading.Lock()
+        self.disk_evictions = 0
+        self.memory_limit = memory_limit
+        # Memory the process already needs without any cached results
+        self.baseline_rss = process_rss() if memory_limit else 0
+        self.memory_budget = max(0, memory_limit - self.baseline_rss) if memory_limit else max_bytes
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.pressure_evictions = 0
+
+    def _disk_path(self, key):
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()
+        return os.path.join(self.directory, f"{digest}.pkl")
+
+    def _drop(self, key):
+        _, size, _, _ = self.entries.pop(key)
+        self.total_bytes -= size
+
+    def _insert(self, key, value, version, created, size=None):
+        size = estimate_size(value) if size is None else size
+        if size > self.max_bytes:
+            return
+        if key in self.entries:
+            self._drop(key)
+        self.entries[key] = (value, size, version, created)
+        self.total_bytes += size
+        while self.total_bytes > self.max_bytes:
+            self._drop(next(iter(self.entries)))
+            self.evictions += 1
+
+    def _relieve_pressure(self, keep):
+        # Over the cache's share of the process ceiling: drop least recently
+        # used entries, never the one just inserted
+        while self.total_bytes > self.memory_budget:
+            key = next((k for k in self.entries if k != keep), None)
+            if key is None:
+                break
+            self._drop(key)
+            self.pressure_evictions += 1
+
+    def _fresh(self, version, created, expected_version):
+        return version == expected_version and time.time() - created < self.ttl
+
+    def _remove_file(self, path):
+        try:
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def prune_disk(self):
+        # Expired files first, then the least recently used until the tier fits its size cap
+        files = []
+        now = time.time()
+        for entry in os.scandir(self.directory):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            if now - stat.st_mtime >= self.ttl:
+                # Expired entries, and temporary files left behind by a crashed writer
+                if self._remove_file(entry.path) and entry.name.endswith('.pkl'):
+                    self.disk_evictions += 1
+            elif entry.name.endswith('.pkl'):
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if not self.disk_max_bytes or total <= self.disk_max_bytes:
+                break
+            if self._remove_file(path):
+                self.disk_evictions += 1
+            total -= size
+
+    def _maybe_prune_disk(self):
+        if time.time() - self.pruned_at < PRUNE_INTERVAL or not self.prune_lock.acquire(blocking=False):
+            return
+        try:
+            self.pruned_at = time.time()
+            self.prune_disk()
+        except OSError as e:
+            log_error('cache_prune_failed', directory=self.directory, error=str(e))
+        finally:
+            self.prune_lock.release()
+
+    def get(self, key, version):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                value, _, entry_version, created = entry
+                if self._fresh(entry_version, created, version):
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._drop(key)
+
+        if self.directory:
+            path = self._disk_path(key)
+            try:
+                with open(path, 'rb') as file:
+                    value, entry_version, created = pickle.load(file)
+            except FileNotFoundError:
+                value = None
+            except (pickle.UnpicklingError, EOFError, AttributeError):
+                value = None
+                self._remove_file(path)
+            if value is not None:
+                if self._fresh(entry_version, created, version):
+                    # Recently used files are the last to go when the tier is pruned
+                    with contextlib.suppress(OSError):
+                        os.utime(path)
+                    with self.lock:
+                        self._insert(key, value, entry_version, created)
+                        self.hits += 1
+                    return value
+                # Superseded by a newer download or expired; it will only be rewritten
+                if self._remove_file(path):
+                    self.disk_evictions += 1
+
+        with self.lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, value, version, size=None):
+        # `size` overrides the estimate, e.g. for values sharing arrays with another entry
+        created = time.time()
+        with self.lock:
+            self._insert(key, value, version, created, size)
+            if self.memory_limit:
+                self._relieve_pressure(key)
+
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self._disk_path(key)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp_path, 'wb') as file:
+                    pickle.dump((value, version, created), file, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                log_error('cache_write_failed', path=path, error=str(e))
+            self._maybe_prune_disk()
+
+    def get_or_build(self, key, version, build):
+        value = self.get(key, version)
+        if value is None:
+            value = build()
+            self.put(key, value, version)
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+                'memory_budget': self.memory_budget,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'pressure_evictions': self.pressure_evictions,
+                'disk_evictions': self.disk_evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+analysis_cache = ResultCache(int(CACHE_MB * 1024 * 1024), CACHE_TTL, CACHE_DIR, int(MEMORY_MB * 1024 * 1024),
+                             int(CACHE_DIR_MB * 1024 * 1024))
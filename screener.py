@@ -0,0 +1,91 @@
+import os
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+import catalog
+import price_store
+import seasonal
+import trading_calendar
+
+# Seasonal screener: the window metrics shown for a single instrument in the
+# app, computed for every instrument of a country from the local price store
+# and ranked. Only cached prices are used; warm the store with bulk_fetch.py.
+SORT_COLUMNS = ('mean', 'ratio', 'max', 'min', 'cumulative')
+# Worker processes when screening from the app; they are spawned rather than
+# forked, as forking the multithreaded server can inherit held locks
+APP_WORKERS = int(os.environ.get('PULSE_SCREENER_WORKERS', min(4, os.cpu_count() or 1)))
+
+
+def _screen_chunk(isins, start_doy, end_doy, exclude_years):
+    rows = []
+    for isin in isins:
+        prices = price_store.load_prices(isin, columns=['date', 'Close'] + trading_calendar.CALENDAR_COLUMNS)
+        if len(prices) < 2:
+            continue
+        matrix = seasonal.SeasonalMatrix.from_prices(seasonal.daily_returns(prices))
+        summary = matrix.window_summary(start_doy, end_doy, exclude_years)
+        if not len(summary['years']):
+            continue
+        rows.append({'isin': isin, 'years': len(summary['years']), **summary['metrics']})
+    return rows
+
+
+def screen(isins, start_md, end_md, exclude_years=(), sort_by='mean', workers=None, chunk_size=64):
+    # Rank instruments by their pattern over the [start_md, end_md] window
+    start_doy = seasonal.to_day_of_year(start_md)
+    end_doy = seasonal.to_day_of_year(end_md)
+    exclude_years = list(exclude_years)
+
+    chunks = [isins[i:i + chunk_size] for i in range(0, len(isins), chunk_size)]
+    rows = []
+    if workers == 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            rows.extend(_screen_chunk(chunk, start_doy, end_doy, exclude_years))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            futures = [pool.submit(_screen_chunk, chunk, start_doy, end_doy, exclude_years) for chunk in chunks]
+            for future in futures:
+                rows.extend(future.result())
+
+    columns = ['isin', 'years', 'max', 'min', 'mean', 'cumulative', 'positive', 'negative', 'ratio']
+    results = pd.DataFrame(rows, columns=columns)
+    return results.sort_values(sort_by, ascending=False, kind='stable').reset_index(drop=True)
+
+
+def screen_country(country, start_md, end_md, instrument_type='STOCK', exclude_years=(), sort_by='mean',
+                   workers=None):
+    instruments = catalog.load_catalog()
+    rows = instruments.rows(country, instrument_type)
+    isins = [isin for isin in instruments.isin[rows] if isinstance(isin, str)]
+
+    results = screen(isins, start_md, end_md, exclude_years, sort_by=sort_by, workers=workers)
+    names = {isin: instruments.company[instruments.isin_index[isin]] for isin in results['isin']}
+    results.insert(1, 'company', results['isin'].map(names))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rank a country's instruments by seasonal window strength.")
+    parser.add_argument('country')
+    parser.add_argument('--window', default='01-01:12-31', help="MM-DD:MM-DD day-of-year window")
+    parser.add_argument('--instrument-type', default='STOCK')
+    parser.add_argument('--exclude-year', type=int, action='append', default=[])
+    parser.add_argument('--sort-by', choices=SORT_COLUMNS, default='mean')
+    parser.add_argument('--top', type=int, default=25)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    try:
+        start_md, end_md = seasonal.parse_window(args.window)
+    except ValueError as e:
+        parser.error(str(e))
+    results = screen_country(args.country, start_md, end_md, args.instrument_type, args.exclude_year,
+                             sort_by=args.sort_by, workers=args.workers)
+    with pd.option_context('display.max_rows', None, 'display.width', 200):
+        print(results.head(args.top).to_string(index=False))
+    print(f"\n{len(results)} instruments with cached data")
+
+
+if __name__ == "__main__":
+    main()
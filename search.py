@@ -0,0 +1,96 @@
+import re
+import numpy as np
+import pandas as pd
+
+# Typeahead search over the instrument catalog. Every row is split into
+# lowercase word tokens from the company name, ISIN and symbol; the tokens are
+# kept as one sorted byte-string array next to the row they came from, which
+# makes it a flattened prefix trie: all tokens starting with a prefix are one
+# contiguous range found with two binary searches.
+TOKEN_BYTES = 12
+SCAN_CHUNK = 256
+MAX_SCAN = 8192
+TOKEN_PATTERN = re.compile(r'[^\W_]+')
+
+
+def tokenize(text):
+    if not isinstance(text, str):
+        return []
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def _encode(term):
+    return term.encode('utf-8')[:TOKEN_BYTES]
+
+
+def _successor(prefix):
+    # Smallest byte string above every string starting with prefix (UTF-8 never contains 0xff)
+    return prefix[:-1] + bytes([prefix[-1] + 1])
+
+
+class SearchIndex:
+
+    def __init__(self, company, isin, symbol):
+        fields = pd.DataFrame({'company': company, 'isin': isin, 'symbol': symbol}).fillna('')
+        text = fields['company'] + ' ' + fields['isin'] + ' ' + fields['symbol']
+        tokens = text.str.lower().str.findall(TOKEN_PATTERN).explode().dropna()
+        tokens = tokens[tokens != '']
+
+        # Tokens are truncated to TOKEN_BYTES; longer query terms are checked against the full row
+        encoded = np.array([token.encode('utf-8')[:TOKEN_BYTES] for token in tokens], dtype=f'S{TOKEN_BYTES}')
+        rows = tokens.index.to_numpy(dtype=np.int32)
+        order = np.lexsort((rows, encoded))
+        self.tokens = encoded[order]
+        self.rows = rows[order]
+        self.company = company
+        self.isin = isin
+        self.symbol = symbol
+
+    def __len__(self):
+        return len(self.company)
+
+    def row_words(self, row):
+        return tokenize(f"{self.company[row]} {self.isin[row]} {self.symbol[row]}")
+
+    def prefix_range(self, term):
+        # Bounds are cast to the token dtype so searchsorted doesn't convert the whole array
+        prefix = _encode(term)
+        bounds = np.array([prefix, _successor(prefix)], dtype=self.tokens.dtype)
+        start, stop = np.searchsorted(self.tokens, bounds, side='left')
+        return int(start), int(stop)
+
+    def search(self, query, limit=20, row_range=None):
+        # Row numbers for the best `limit` matches of every query term, as
+        # prefixes of a word in the row's text. Rows whose token equals the
+        # term come first, then longer tokens in alphabetical order.
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        # Walk the narrowest term's range; the other terms (and a term longer
+        # than the stored tokens) are checked against the row's own words
+        ranges = [self.prefix_range(term) for term in terms]
+        driver = min(range(len(terms)), key=lambda i: ranges[i][1] - ranges[i][0])
+        start, stop = ranges[driver]
+        verify = len(terms) > 1 or len(terms[0].encode('utf-8')) > TOKEN_BYTES
+
+        matches = {}
+        scanned = 0
+        for chunk_start in range(start, stop, SCAN_CHUNK):
+            candidates = self.rows[chunk_start:min(chunk_start + SCAN_CHUNK, stop)]
+            if row_range is not None:
+                candidates = candidates[(candidates >= row_range[0]) & (candidates < row_range[1])]
+            for row in candidates.tolist():
+                if row in matches:
+                    continue
+                if verify:
+                    words = self.row_words(row)
+                    if not all(any(word.startswith(term) for word in words) for term in terms):
+                        continue
+                matches[row] = None
+                if len(matches) >= limit:
+                    return list(matches)
+            scanned += SCAN_CHUNK
+            if scanned >= MAX_SCAN:
+                break
+        return list(matches)
@@ -0,0 +1,273 @@
+import os
+import time
+import shutil
+import hashlib
+import contextlib
+import threading
+import numpy as np
+import pandas as pd
+from trading_calendar import CALENDAR_COLUMNS, calendar
+from instrumentation import log_error
+from result_cache import CACHE_TTL, PRUNE_INTERVAL
+
+# Seasonal engine: daily returns laid out as a years x 366 matrix indexed by
+# day of the (leap) year, so the average curve and every window query is a
+# vectorized reduction instead of a strftime/groupby pass over the raw frame.
+DAYS_IN_YEAR = 366
+
+# 'MM-DD' label for every column, Feb 29 included
+MONTH_DAYS = pd.date_range('2000-01-01', '2000-12-31').strftime('%m-%d').to_numpy()
+MONTH_DAY_INDEX = {month_day: i for i, month_day in enumerate(MONTH_DAYS)}
+
+# Matrices are read-only once built and shared by every session. With
+# PULSE_MMAP_DIR set their arrays are also written there as .npy files and
+# memory-mapped back, so worker processes share one page-cache copy.
+MMAP_DIR = os.environ.get('PULSE_MMAP_DIR') or None
+# Saved matrices unused for this long are removed, checked every PRUNE_INTERVAL seconds
+MMAP_TTL = CACHE_TTL
+MATRIX_ARRAYS = ('years', 'returns', 'observed', 'log_returns', 'cum_log', 'cum_simple', 'cum_count')
+
+_pruned_at = 0.0
+_prune_lock = threading.Lock()
+
+
+class SeasonalMatrix:
+
+    def __init__(self, years, returns):
+        self.years = years
+        # Simple returns with NaN where the instrument didn't trade on that day
+        self.returns = returns
+        self.observed = ~np.isnan(returns)
+        self.log_returns = np.log1p(np.where(self.observed, returns, 0.0))
+
+        # Prefix sums along the day-of-year axis with a leading zero column, so
+        # any window [a, b] is prefix[:, b + 1] - prefix[:, a] per year
+        self.cum_log = self._prefix(self.log_returns)
+        self.cum_simple = self._prefix(np.where(self.observed, returns, 0.0))
+        self.cum_count = self._prefix(self.observed.astype(np.int32))
+        self._freeze()
+
+    def _freeze(self):
+        for name in MATRIX_ARRAYS:
+            getattr(self, name).flags.writeable = False
+
+    @staticmethod
+    def _prefix(values):
+        prefix = np.zeros((values.shape[0], values.shape[1] + 1), dtype=values.dtype)
+        np.cumsum(values, axis=1, out=prefix[:, 1:])
+        return prefix
+
+    @classmethod
+    def from_prices(cls, ticker_data):
+        # Build from a frame with 'date' and 'daily_return' columns, placing
+        # returns by the stored integer calendar index when it's there
+        year, doy, _ = calendar(ticker_data)
+        daily_return = ticker_data['daily_return'].to_numpy(dtype=float)
+
+        years, row = np.unique(year, return_inverse=True)
+        returns = np.full((len(years), DAYS_IN_YEAR), np.nan)
+        returns[row, doy] = daily_return
+        return cls(years.astype(int), returns)
+
+    def save(self, directory):
+        # One .npy per array, written to a temporary directory and renamed into place
+        tmp_directory = f"{directory}.{os.getpid()}.{threading.get_ident()}.tmp"
+        os.makedirs(tmp_directory, exist_ok=True)
+        try:
+            for name in MATRIX_ARRAYS:
+                np.save(os.path.join(tmp_directory, f"{name}.npy"), getattr(self, name))
+            os.rename(tmp_directory, directory)
+        except OSError:
+            # Another process got there first
+            shutil.rmtree(tmp_directory, ignore_errors=True)
+            if not os.path.isdir(directory):
+                raise
+
+    @classmethod
+    def load(cls, directory):
+        # Memory-mapped, read-only view of a saved matrix
+        matrix = cls.__new__(cls)
+        for name in MATRIX_ARRAYS:
+            setattr(matrix, name, np.load(os.path.join(directory, f"{name}.npy"), mmap_mode='r'))
+        return matrix
+
+    def year_mask(self, exclude_years=()):
+        if not len(exclude_years):
+            return np.ones(len(self.years), dtype=bool)
+        return ~np.isin(self.years, list(exclude_years))
+
+    def average_curve(self, exclude_years=()):
+        # Mean daily return per day of year and the growth of $100 along it
+        rows = self.year_mask(exclude_years)
+        observed = self.observed[rows]
+        counts = observed.sum(axis=0)
+        totals = np.where(observed, self.returns[rows], 0.0).sum(axis=0)
+
+        days = counts > 0
+        avg_returns = totals[days] / counts[days]
+        growth = np.cumprod(1 + avg_returns) * 100
+        return pd.DataFrame({
+            'month_day': MONTH_DAYS[days],
+            'daily_return': avg_returns,
+            'growth': growth,
+        })
+
+    def window_returns(self, start_doy, end_doy, exclude_years=()):
+        # Compounded return per year over the inclusive day-of-year window;
+        # years without a single observation in the window are left out
+        if start_doy > end_doy:
+            raise ValueError(f"Window {MONTH_DAYS[start_doy]} to {MONTH_DAYS[end_doy]} wraps the year end")
+        rows = self.year_mask(exclude_years)
+        start, stop = start_doy, end_doy + 1
+
+        counts = self.cum_count[rows, stop] - self.cum_count[rows, start]
+        has_data = counts > 0
+        compounded = np.expm1(self.cum_log[rows, stop] - self.cum_log[rows, start])
+        simple_sum = (self.cum_simple[rows, stop] - self.cum_simple[rows, start]).sum()
+
+        return self.years[rows][has_data], compounded[has_data], simple_sum
+
+    def window_summary(self, start_doy, end_doy, exclude_years=()):
+        years, returns, simple_sum = self.window_returns(start_doy, end_doy, exclude_years)
+        return {
+            'years': years,
+            'returns': returns,
+            'metrics': window_metrics(years, returns, simple_sum),
+        }
+
+
+def window_metrics(years, returns, simple_sum):
+    # The seven summary metrics shown above the yearly charts; returns are
+    # rounded to two decimals first, as they are displayed per year
+    returns = np.round(returns, 2)
+    positive = int((returns > 0).sum())
+    negative = int((returns < 0).sum())
+    return {
+        'max': float(returns.max()) if len(returns) else np.nan,
+        'min': float(returns.min()) if len(returns) else np.nan,
+        'mean': float(returns.mean()) if len(returns) else np.nan,
+        'cumulative': float(simple_sum),
+        'positive': positive,
+        'negative': negative,
+        'ratio': positive / len(returns) if len(returns) else np.nan,
+    }
+
+
+def overlay(matrices, exclude_years=()):
+    # Growth curves, pairwise seasonal correlations and an equal-weight basket
+    # for several instruments at once. Every matrix is placed on one shared
+    # year axis, so the whole set is a single instruments x years x 366 array.
+    years = np.unique(np.concatenate([matrix.years for matrix in matrices]))
+    returns = np.full((len(matrices), len(years), DAYS_IN_YEAR), np.nan)
+    for i, matrix in enumerate(matrices):
+        returns[i, np.searchsorted(years, matrix.years)] = matrix.returns
+    if len(exclude_years):
+        returns[:, np.isin(years, list(exclude_years))] = np.nan
+
+    # Mean daily return per instrument and day; days without data add nothing to growth
+    observed = ~np.isnan(returns)
+    counts = observed.sum(axis=1)
+    totals = np.where(observed, returns, 0.0).sum(axis=1)
+    avg_returns = np.divide(totals, counts, out=np.full(counts.shape, np.nan), where=counts > 0)
+    growth = np.cumprod(1 + np.nan_to_num(avg_returns), axis=1) * 100
+
+    # Equal-weight basket over the instruments with data on each day
+    has_data = counts > 0
+    basket_counts = has_data.sum(axis=0)
+    basket_returns = np.divide(np.where(has_data, avg_returns, 0.0).sum(axis=0), basket_counts,
+                               out=np.full(DAYS_IN_YEAR, np.nan), where=basket_counts > 0)
+    basket_growth = np.cumprod(1 + np.nan_to_num(basket_returns)) * 100
+
+    # Correlation of the average daily-return curves over days every instrument has
+    shared = has_data.all(axis=0)
+    if shared.sum() > 1 and len(matrices) > 1:
+        correlation = np.corrcoef(avg_returns[:, shared])
+    else:
+        correlation = np.full((len(matrices), len(matrices)), np.nan)
+
+    return {
+        'avg_returns': avg_returns,
+        'growth': growth,
+        'basket_returns': basket_returns,
+        'basket_growth': basket_growth,
+        'correlation': correlation,
+    }
+
+
+def daily_returns(prices):
+    # Daily close-to-close returns from a stored price frame, calendar index included
+    ticker_data = prices[['date', 'Close'] + [c for c in CALENDAR_COLUMNS if c in prices.columns]].copy()
+    ticker_data['daily_return'] = ticker_data['Close'].pct_change()
+    return ticker_data.dropna()
+
+
+def parse_window(value):
+    # 'MM-DD:MM-DD' -> ('MM-DD', 'MM-DD'); windows run within one calendar year
+    parts = value.split(':')
+    if len(parts) != 2 or not all(part in MONTH_DAY_INDEX for part in parts):
+        raise ValueError(f"Invalid window '{value}', expected MM-DD:MM-DD")
+    if MONTH_DAY_INDEX[parts[0]] > MONTH_DAY_INDEX[parts[1]]:
+        raise ValueError(f"Invalid window '{value}': the start must not be after the end "
+                         f"(windows can't wrap the year end)")
+    return parts[0], parts[1]
+
+
+def to_day_of_year(month_day):
+    # Accept either a column index or an 'MM-DD' label
+    if isinstance(month_day, str):
+        return MONTH_DAY_INDEX[month_day]
+    return int(month_day)
+
+
+def prune_mapped(now=None):
+    # Drop saved matrices not used for MMAP_TTL seconds, and instruments left without any
+    now = now or time.time()
+    for base in os.scandir(MMAP_DIR):
+        if not base.is_dir():
+            continue
+        for entry in os.scandir(base.path):
+            try:
+                expired = now - entry.stat().st_mtime >= MMAP_TTL
+            except FileNotFoundError:
+                continue
+            if expired:
+                shutil.rmtree(entry.path, ignore_errors=True)
+        with contextlib.suppress(OSError):
+            os.rmdir(base.path)
+
+
+def _maybe_prune_mapped():
+    global _pruned_at
+    if time.time() - _pruned_at < PRUNE_INTERVAL or not _prune_lock.acquire(blocking=False):
+        return
+    try:
+        _pruned_at = time.time()
+        prune_mapped()
+    except OSError as e:
+        log_error('matrix_mmap_prune_failed', directory=MMAP_DIR, error=str(e))
+    finally:
+        _prune_lock.release()
+
+
+def shared(matrix, identity, version):
+    # The matrix itself, or its memory-mapped copy under MMAP_DIR when configured.
+    # Copies are grouped per instrument (`identity`); `version` holds the date
+    # range and store stamp, so a rolling end date adds a sibling that is
+    # pruned once it hasn't been used for MMAP_TTL seconds.
+    if not MMAP_DIR:
+        return matrix
+    base = os.path.join(MMAP_DIR, hashlib.sha1(repr(identity).encode()).hexdigest())
+    directory = os.path.join(base, hashlib.sha1(repr(version).encode()).hexdigest())
+    try:
+        if os.path.isdir(directory):
+            # Processes still mapping a pruned copy keep their pages until they drop them
+            os.utime(directory)
+        else:
+            os.makedirs(base, exist_ok=True)
+            matrix.save(directory)
+        mapped = SeasonalMatrix.load(directory)
+    except OSError as e:
+        log_error('matrix_mmap_failed', directory=directory, error=str(e))
+        return matrix
+    _maybe_prune_mapped()
+    return mapped
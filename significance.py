@@ -0,0 +1,121 @@
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from seasonal import DAYS_IN_YEAR
+
+# Significance of a seasonal window against chance. Three resampling tests,
+# each a handful of NumPy operations over a resamples x years batch:
+#
+#   random window  every year's return is replaced by the return of a window
+#                  of the same length starting on a random day of that year;
+#                  p-values for the mean return and the hit rate say how often
+#                  randomly timed windows do at least as well as this one
+#                  (None for a window covering the whole year)
+#   sign flip      the signs of the yearly returns are flipped at random, a
+#                  permutation test of the mean return against zero
+#   bootstrap      years are drawn with replacement for percentile confidence
+#                  intervals of the mean return and the hit rate
+#
+# Window returns come from the matrix' prefix sums, so a batch of 10,000
+# resamples over 50 years is a single gather. Resamples are split into
+# batches with their own seeds, which keeps results reproducible whether the
+# batches run in this process or on a process pool.
+RESAMPLES = int(os.environ.get('PULSE_SIGNIFICANCE_RESAMPLES', 10000))
+WORKERS = int(os.environ.get('PULSE_SIGNIFICANCE_WORKERS', 1))
+BATCH_SIZE = 2000
+CONFIDENCE = 0.95
+SEED = 0
+
+
+def _window_batch(cum_log, cum_count, length, starts):
+    # Compounded return of the window [start, start + length) in every year,
+    # for a resamples x years array of start days; NaN for years without data
+    rows = np.arange(cum_log.shape[0])[None, :]
+    counts = cum_count[rows, starts + length] - cum_count[rows, starts]
+    returns = np.expm1(cum_log[rows, starts + length] - cum_log[rows, starts])
+    return np.where(counts > 0, returns, np.nan)
+
+
+def _batch(job):
+    # One batch of every test; returns the exceedance counts and the bootstrap statistics
+    cum_log, cum_count, length, returns, seed, size = job
+    rng = np.random.default_rng(seed)
+    observed_mean, observed_hit = returns.mean(), (returns > 0).mean()
+    batch = {'mean_exceed': 0, 'hit_rate_exceed': 0, 'valid': 0}
+
+    # A window covering the whole year has no differently timed alternative
+    if length < DAYS_IN_YEAR:
+        starts = rng.integers(0, DAYS_IN_YEAR - length + 1, size=(size, cum_log.shape[0]))
+        random_returns = _window_batch(cum_log, cum_count, length, starts)
+        traded = ~np.isnan(random_returns)
+        years = traded.sum(axis=1)
+        with np.errstate(invalid='ignore'):
+            random_mean = np.where(traded, random_returns, 0.0).sum(axis=1) / years
+            random_hit = (random_returns > 0).sum(axis=1) / years
+        batch = {
+            'mean_exceed': int((random_mean >= observed_mean).sum()),
+            'hit_rate_exceed': int((random_hit >= observed_hit).sum()),
+            'valid': int((years > 0).sum()),
+        }
+
+    signs = rng.choice(np.array([-1.0, 1.0]), size=(size, len(returns)))
+    flipped_mean = (signs * np.abs(returns)).mean(axis=1)
+
+    picks = rng.integers(0, len(returns), size=(size, len(returns)))
+    resampled = returns[picks]
+
+    return {
+        **batch,
+        'sign_exceed': int((flipped_mean >= observed_mean).sum()),
+        'bootstrap_mean': resampled.mean(axis=1),
+        'bootstrap_hit_rate': (resampled > 0).mean(axis=1),
+    }
+
+
+def _p_value(exceed, total):
+    # Add-one estimate, so a p-value from resamples is never exactly zero;
+    # None when there was nothing to compare against
+    return (exceed + 1) / (total + 1) if total else None
+
+
+def _interval(values, confidence):
+    tail = (1 - confidence) / 2 * 100
+    low, high = np.percentile(values, [tail, 100 - tail])
+    return float(low), float(high)
+
+
+def window_significance(matrix, start_doy, end_doy, exclude_years=(), resamples=RESAMPLES, seed=SEED,
+                        confidence=CONFIDENCE, workers=WORKERS):
+    # p-values and confidence intervals for the inclusive day-of-year window
+    years, returns, _ = matrix.window_returns(start_doy, end_doy, exclude_years)
+    if not len(returns):
+        return None
+
+    # Random windows are drawn over the same years the observed window was traded in
+    rows = np.isin(matrix.years, years)
+    cum_log = np.ascontiguousarray(matrix.cum_log[rows])
+    cum_count = np.ascontiguousarray(matrix.cum_count[rows])
+    length = end_doy - start_doy + 1
+
+    sizes = [min(BATCH_SIZE, resamples - offset) for offset in range(0, resamples, BATCH_SIZE)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    jobs = [(cum_log, cum_count, length, returns, batch_seed, size) for batch_seed, size in zip(seeds, sizes)]
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as executor:
+            batches = list(executor.map(_batch, jobs))
+    else:
+        batches = [_batch(job) for job in jobs]
+
+    valid = sum(batch['valid'] for batch in batches)
+    return {
+        'resamples': resamples,
+        'years': len(returns),
+        'confidence': confidence,
+        'mean': float(returns.mean()),
+        'hit_rate': float((returns > 0).mean()),
+        'p_mean': _p_value(sum(batch['mean_exceed'] for batch in batches), valid),
+        'p_hit_rate': _p_value(sum(batch['hit_rate_exceed'] for batch in batches), valid),
+        'p_sign': _p_value(sum(batch['sign_exceed'] for batch in batches), resamples),
+        'mean_ci': _interval(np.concatenate([batch['bootstrap_mean'] for batch in batches]), confidence),
+        'hit_rate_ci': _interval(np.concatenate([batch['bootstrap_hit_rate'] for batch in batches]), confidence),
+    }
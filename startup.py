@@ -0,0 +1,117 @@
+import os
+import sys
+import time
+import argparse
+import importlib
+import threading
+import catalog
+from instrumentation import span, log_event, log_error
+
+# Cold start of an app worker. A new process pays for its imports, the
+# catalog load and the static assets before it can serve the first page, so:
+#   - app.py only imports what the landing page needs; Altair (charts.py) and
+#     yfinance (analysis.py) are imported on first use,
+#   - static assets are read once per process, re-read only when the file changes,
+#   - the catalog is loaded in a background thread as soon as the process
+#     starts, and the chart modules are warmed up after it,
+#   - every stage is timed from process start and logged as a 'startup' event.
+#
+# Launch with `python startup.py [streamlit options]` to start the preload
+# before the server takes its first request; with a plain `streamlit run app.py`
+# it starts on the first rerun instead.
+APP_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+PRELOAD = os.environ.get('PULSE_PRELOAD', '1') != '0'
+# Imported in the background once the catalog is in memory
+WARM_MODULES = ('altair', 'charts')
+
+
+def _process_started():
+    # Wall-clock start of this process (Linux), else the import of this module
+    try:
+        with open('/proc/self/stat', 'r') as file:
+            ticks = int(file.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime', 'r') as file:
+            uptime = float(file.read().split()[0])
+        return time.time() - uptime + ticks / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError):
+        return time.time()
+
+
+STARTED = _process_started()
+
+_timings = {}
+_timings_lock = threading.Lock()
+_assets = {}
+_assets_lock = threading.Lock()
+_preload_thread = None
+_preload_lock = threading.Lock()
+
+
+def mark(stage):
+    # Milliseconds from process start to the first time this stage is reached
+    with _timings_lock:
+        if stage in _timings:
+            return _timings[stage]
+        ms = _timings[stage] = round((time.time() - STARTED) * 1000, 1)
+    log_event('startup', stage=stage, ms=ms)
+    return ms
+
+
+def timings():
+    with _timings_lock:
+        return dict(_timings)
+
+
+def read_asset(path):
+    # File contents cached for the life of the process; re-read when the file changes
+    mtime = os.stat(path).st_mtime_ns
+    cached = _assets.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    with _assets_lock:
+        with open(path, 'r') as file:
+            text = file.read()
+        _assets[path] = (mtime, text)
+    return text
+
+
+def _preload():
+    try:
+        with span('startup_preload'):
+            catalog.load_catalog()
+            mark('catalog_ready')
+            for name in WARM_MODULES:
+                importlib.import_module(name)
+            mark('modules_warm')
+    except Exception as e:
+        log_error('startup_preload_failed', error=str(e))
+
+
+def preload():
+    # Start the background preload once per process
+    global _preload_thread
+    if not PRELOAD:
+        return None
+    with _preload_lock:
+        if _preload_thread is None:
+            _preload_thread = threading.Thread(target=_preload, name='pulse-preload', daemon=True)
+            _preload_thread.start()
+        return _preload_thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Start the Pulse app with the catalog preloaded in the background.",
+                                     epilog="Any other options are passed on to `streamlit run`, e.g. --server.port 8501")
+    _, options = parser.parse_known_args()
+
+    preload()
+    from streamlit.web import cli
+    mark('server_import')
+    sys.argv = ['streamlit', 'run', APP_SCRIPT] + options
+    sys.exit(cli.main())
+
+
+if __name__ == "__main__":
+    # Run as the importable module so app.py shares the same preload and timings
+    import startup
+    startup.main()
@@ -1,115 +1,243 @@
-import investpy
-import pandas as pd
-import os
-
-# Set display options
-pd.set_option('display.max_rows', None)
-pd.set_option('display.max_columns', None)
-
-COUNTRY_CODES = {
-    'netherlands': 'NL',
-    'germany': 'DE',
-    'france': 'FR',
-    'switzerland': 'CH',
-    'united states': 'US',
-    'united kingdom': 'GB',
-    'india': 'IN',
-    'australia': 'AU',
-    'china': 'CN',
-    'brazil': 'BR',
-    'japan': 'JP',
-    'indonesia': 'ID',
-    'south korea': 'KR'
-}
-
-def get_country_stocks(country):
-    try:
-        print(f"\nFetching stocks for {country.title()}...")
-        stocks = investpy.stocks.get_stocks(country=country)
-        print(f"Found {len(stocks)} stocks before filtering")
-        
-        country_code = COUNTRY_CODES.get(country.lower())
-        if not country_code:
-            raise Exception(f"No country code mapping found for {country}")
-            
-        stocks = stocks[stocks['isin'].str.startswith(country_code)]
-        print(f"Found {len(stocks)} stocks after filtering for {country_code}")
-        
-        if len(stocks) == 0:
-            raise Exception(f"No stocks found for {country} with ISIN starting with {country_code}")
-            
-        stocks['combined'] = stocks['name'] + ' | ' + stocks['isin']
-        stocks = stocks[['country', 'name', 'isin', 'symbol', 'combined']]
-        stocks = stocks.rename(columns={'name': 'company'})
-        return stocks
-    except Exception as e:
-        print(f"Error fetching stocks for {country}: {str(e)}")
-        return None
-
-def process_stocks():
-    csv_file = 'all_stocks.csv'
-    summary = {
-        'total_new_stocks': 0,
-        'total_updated_stocks': 0,
-        'countries_processed': 0,
-        'countries_failed': 0,
-        'country_stats': {}
-    }
-
-    all_stocks = pd.DataFrame()
-    existing_data = pd.DataFrame()
-
-    if os.path.exists(csv_file):
-        existing_data = pd.read_csv(csv_file)
-        print(f"\nExisting stocks in file: {len(existing_data)}")
-
-    for country in COUNTRY_CODES.keys():
-        country_stocks = get_country_stocks(country)
-        if country_stocks is not None:
-            summary['countries_processed'] += 1
-            
-            if len(existing_data) > 0:
-                new_isins = set(country_stocks['isin']) - set(existing_data['isin'])
-                updated_isins = set(country_stocks['isin']) & set(existing_data['isin'])
-                
-                summary['country_stats'][country] = {
-                    'new': len(new_isins),
-                    'updated': len(updated_isins)
-                }
-                
-                summary['total_new_stocks'] += len(new_isins)
-                summary['total_updated_stocks'] += len(updated_isins)
-            else:
-                summary['country_stats'][country] = {
-                    'new': len(country_stocks),
-                    'updated': 0
-                }
-                summary['total_new_stocks'] += len(country_stocks)
-            
-            all_stocks = pd.concat([all_stocks, country_stocks])
-        else:
-            summary['countries_failed'] += 1
-
-    # Combine with existing data and remove duplicates
-    if len(existing_data) > 0:
-        all_stocks = pd.concat([existing_data, all_stocks])
-    all_stocks = all_stocks.drop_duplicates(subset='isin', keep='last')
-    
-    # Save to CSV
-    all_stocks.to_csv(csv_file, index=False)
-    
-    # Print summary
-    print("\n=== SUMMARY ===")
-    print(f"Countries processed successfully: {summary['countries_processed']}")
-    print(f"Countries failed: {summary['countries_failed']}")
-    print(f"Total new stocks added: {summary['total_new_stocks']}")
-    print(f"Total stocks updated: {summary['total_updated_stocks']}")
-    print("\nPer country statistics:")
-    for country, stats in summary['country_stats'].items():
-        print(f"{country.title()}: {stats['new']} new, {stats['updated']} updated")
-    print(f"\nTotal stocks in database: {len(all_stocks)}")
-
-if __name__ == "__main__":
-    process_stocks()
-
-
+import investpy
+import pandas as pd
+import os
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from price_store import DATA_DIR
+from catalog import read_catalog_csv
+
+# Set display options
+pd.set_option('display.max_rows', None)
+pd.set_option('display.max_columns', None)
+
+COUNTRY_CODES = {
+    'netherlands': 'NL',
+    'germany': 'DE',
+    'france': 'FR',
+    'switzerland': 'CH',
+    'united states': 'US',
+    'united kingdom': 'GB',
+    'india': 'IN',
+    'australia': 'AU',
+    'china': 'CN',
+    'brazil': 'BR',
+    'japan': 'JP',
+    'indonesia': 'ID',
+    'south korea': 'KR'
+}
+
+CATALOG_COLUMNS = ['country', 'company', 'isin', 'symbol', 'combined']
+
+# Per-country results of an in-progress refresh
+CHECKPOINT_DIR = os.path.join(DATA_DIR, 'catalog_refresh')
+# The catalog indexed by ISIN, kept between refreshes and rebuilt only when
+# the CSV changes on disk (fingerprint in the JSON sidecar)
+INDEX_FILE = os.path.join(DATA_DIR, 'catalog_index.parquet')
+INDEX_META_FILE = os.path.join(DATA_DIR, 'catalog_index.json')
+
+def get_country_stocks(country):
+    try:
+        print(f"\nFetching stocks for {country.title()}...")
+        stocks = investpy.stocks.get_stocks(country=country)
+        print(f"Found {len(stocks)} stocks before filtering")
+        
+        country_code = COUNTRY_CODES.get(country.lower())
+        if not country_code:
+            raise Exception(f"No country code mapping found for {country}")
+            
+        stocks = stocks[stocks['isin'].str.startswith(country_code)].copy()
+        print(f"Found {len(stocks)} stocks after filtering for {country_code}")
+        
+        if len(stocks) == 0:
+            raise Exception(f"No stocks found for {country} with ISIN starting with {country_code}")
+            
+        stocks['combined'] = stocks['name'] + ' | ' + stocks['isin']
+        stocks = stocks[['country', 'name', 'isin', 'symbol', 'combined']]
+        stocks = stocks.rename(columns={'name': 'company'})
+        return stocks
+    except Exception as e:
+        print(f"Error fetching stocks for {country}: {str(e)}")
+        return None
+
+def _checkpoint_path(country):
+    return os.path.join(CHECKPOINT_DIR, f"{country.replace(' ', '_')}.csv")
+
+
+def _write_csv_atomic(df, path):
+    # Write next to the target and rename over it, so readers never see a partial file
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(country, max_age_hours):
+    path = _checkpoint_path(country)
+    if not os.path.exists(path):
+        return None
+    if time.time() - os.path.getmtime(path) > max_age_hours * 3600:
+        return None
+    return read_catalog_csv(path)
+
+
+def _csv_fingerprint(csv_file):
+    stat = os.stat(csv_file)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _write_json_atomic(data, path):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as file:
+        json.dump(data, file)
+    os.replace(tmp_path, path)
+
+
+def save_index(existing, csv_file):
+    os.makedirs(DATA_DIR, exist_ok=True)
+    tmp_path = f"{INDEX_FILE}.{os.getpid()}.tmp"
+    existing.to_parquet(tmp_path)
+    os.replace(tmp_path, INDEX_FILE)
+    _write_json_atomic({'csv_file': os.path.abspath(csv_file), 'fingerprint': _csv_fingerprint(csv_file)},
+                       INDEX_META_FILE)
+
+
+def load_index(csv_file):
+    # ISIN-indexed catalog (one row per ISIN, last occurrence wins) from the
+    # persisted index when it matches the CSV, otherwise parsed and persisted
+    if not os.path.exists(csv_file):
+        return pd.DataFrame(columns=CATALOG_COLUMNS).set_index('isin')
+    try:
+        with open(INDEX_META_FILE, 'r') as file:
+            meta = json.load(file)
+        if meta == {'csv_file': os.path.abspath(csv_file), 'fingerprint': _csv_fingerprint(csv_file)}:
+            return pd.read_parquet(INDEX_FILE)
+    except (OSError, ValueError):
+        pass
+
+    existing = read_catalog_csv(csv_file).drop_duplicates(subset='isin', keep='last').set_index('isin')
+    try:
+        save_index(existing, csv_file)
+    except OSError as e:
+        print(f"Could not write catalog index: {str(e)}")
+    return existing
+
+
+def fetch_country(country, max_age_hours):
+    # Reuse a recent checkpoint so an interrupted refresh doesn't refetch finished countries
+    stocks = load_checkpoint(country, max_age_hours)
+    if stocks is not None:
+        print(f"Using checkpoint for {country.title()} ({len(stocks)} stocks)")
+        return stocks
+
+    stocks = get_country_stocks(country)
+    if stocks is not None:
+        _write_csv_atomic(stocks, _checkpoint_path(country))
+    return stocks
+
+
+def diff_country(country, stocks, existing):
+    # Compare one country's fresh listing against the ISIN-indexed existing catalog
+    fetched = stocks.drop_duplicates(subset='isin', keep='last').set_index('isin')
+    compare_columns = ['company', 'symbol', 'combined']
+
+    known = fetched.index.isin(existing.index)
+    old = existing.reindex(fetched.index[known])
+    changed = (fetched.loc[known, compare_columns].astype(str) != old[compare_columns].astype(str)).any(axis=1)
+
+    in_country = existing.index[existing['country'].str.lower() == country]
+    removed = in_country.difference(fetched.index)
+
+    return {
+        'added': int((~known).sum()),
+        'changed': int(changed.sum()),
+        'removed': len(removed),
+        'removed_isins': removed,
+    }
+
+
+def process_stocks(csv_file='all_stocks.csv', workers=len(COUNTRY_CODES), max_age_hours=24, prune=False):
+    summary = {
+        'total_added': 0,
+        'total_changed': 0,
+        'total_removed': 0,
+        'countries_processed': 0,
+        'countries_failed': 0,
+        'country_stats': {}
+    }
+
+    # ISIN index over the current catalog, shared by every country diff
+    existing = load_index(csv_file)
+    if os.path.exists(csv_file):
+        print(f"\nExisting stocks in file: {len(existing)}")
+    existing_data = existing.reset_index()[CATALOG_COLUMNS]
+
+    fetched = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(fetch_country, country, max_age_hours): country for country in COUNTRY_CODES}
+        for future in as_completed(futures):
+            country = futures[future]
+            try:
+                country_stocks = future.result()
+            except Exception as e:
+                print(f"Error fetching stocks for {country}: {str(e)}")
+                country_stocks = None
+
+            if country_stocks is None:
+                summary['countries_failed'] += 1
+                continue
+
+            fetched[country] = country_stocks
+            stats = diff_country(country, country_stocks, existing)
+            summary['countries_processed'] += 1
+            summary['country_stats'][country] = stats
+            summary['total_added'] += stats['added']
+            summary['total_changed'] += stats['changed']
+            summary['total_removed'] += stats['removed']
+
+    # Countries that failed keep their existing rows; fresh rows replace old ones by ISIN
+    ordered = [fetched[country] for country in COUNTRY_CODES if country in fetched]
+    all_stocks = pd.concat([existing_data, *ordered]) if ordered else existing_data
+    all_stocks = all_stocks.drop_duplicates(subset='isin', keep='last')
+
+    if prune:
+        removed = [isin for stats in summary['country_stats'].values() for isin in stats['removed_isins']]
+        all_stocks = all_stocks[~all_stocks['isin'].isin(removed)]
+
+    # Save to CSV, and the index of what was written for the next refresh
+    all_stocks = all_stocks[CATALOG_COLUMNS]
+    _write_csv_atomic(all_stocks, csv_file)
+    try:
+        save_index(all_stocks.set_index('isin'), csv_file)
+    except OSError as e:
+        print(f"Could not write catalog index: {str(e)}")
+
+    # Checkpoints are only needed until the catalog has been written
+    for country in fetched:
+        if os.path.exists(_checkpoint_path(country)):
+            os.remove(_checkpoint_path(country))
+
+    # Print summary
+    print("\n=== SUMMARY ===")
+    print(f"Countries processed successfully: {summary['countries_processed']}")
+    print(f"Countries failed: {summary['countries_failed']}")
+    print(f"Total stocks added: {summary['total_added']}")
+    print(f"Total stocks changed: {summary['total_changed']}")
+    print(f"Total stocks removed from source: {summary['total_removed']}" + (" (pruned)" if prune else ""))
+    print("\nPer country statistics:")
+    for country in COUNTRY_CODES:
+        if country in summary['country_stats']:
+            stats = summary['country_stats'][country]
+            print(f"{country.title()}: {stats['added']} added, {stats['changed']} changed, {stats['removed']} removed")
+    print(f"\nTotal stocks in database: {len(all_stocks)}")
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh all_stocks.csv from investpy.")
+    parser.add_argument('--workers', type=int, default=len(COUNTRY_CODES))
+    parser.add_argument('--max-age', type=float, default=24, help="Reuse country checkpoints younger than this many hours")
+    parser.add_argument('--prune', action='store_true', help="Drop instruments no longer listed by the source")
+    args = parser.parse_args()
+    process_stocks(workers=args.workers, max_age_hours=args.max_age, prune=args.prune)
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+
+# Integer calendar index stored with every price series, so seasonal grouping
+# never goes back to date strings or re-derives the calendar from timestamps:
+#
+#   year         calendar year of the session
+#   doy          column on the leap-year calendar (0..365); non-leap years
+#                skip Feb 29, so a calendar date lines up across all years
+#   trading_day  Nth session of the year (0-based) on the instrument's own
+#                exchange, taken from the sessions in the series itself, so
+#                weekends and each market's holidays are never counted; all
+#                intraday bars of a session share its number
+#
+# Dates are the exchange-local session dates yfinance reports, which keeps the
+# index correct across markets in different time zones.
+CALENDAR_COLUMNS = ['year', 'doy', 'trading_day']
+
+
+def day_of_year_index(dates):
+    # Column index on the leap-year calendar: non-leap years skip Feb 29
+    dates = pd.DatetimeIndex(dates)
+    doy = dates.dayofyear.to_numpy() - 1
+    doy += (~dates.is_leap_year & (dates.month > 2)).astype(doy.dtype)
+    return doy
+
+
+def trading_day_index(dates):
+    # Position of every bar's session within its year, for bars sorted by date.
+    # A history starting mid-year is offset by the weekdays before its first
+    # session, as the exchange's earlier sessions aren't in the series.
+    dates = pd.DatetimeIndex(dates)
+    if not len(dates):
+        return np.array([], dtype=np.int16)
+    # Intraday bars are numbered by their session date, not one by one
+    sessions, session_of_bar = np.unique(dates.normalize(), return_inverse=True)
+    sessions = pd.DatetimeIndex(sessions)
+    years = sessions.year.to_numpy()
+    starts = np.concatenate([[0], np.flatnonzero(years[1:] != years[:-1]) + 1])
+    run_lengths = np.diff(np.append(starts, len(years)))
+    index = np.arange(len(years)) - np.repeat(starts, run_lengths)
+    first = sessions[0].date()
+    index[:run_lengths[0]] += np.busday_count(first.replace(month=1, day=1), first)
+    return index[session_of_bar].astype(np.int16)
+
+
+def add_calendar(prices):
+    # Price frame sorted by date with the calendar columns (re)computed
+    prices = prices.drop(columns=[c for c in CALENDAR_COLUMNS if c in prices.columns])
+    if prices.empty:
+        return prices.assign(**{c: pd.Series(dtype=np.int16) for c in CALENDAR_COLUMNS})
+    if not prices['date'].is_monotonic_increasing:
+        prices = prices.sort_values('date', kind='stable').reset_index(drop=True)
+    dates = pd.DatetimeIndex(prices['date'])
+    return prices.assign(
+        year=dates.year.to_numpy().astype(np.int16),
+        doy=day_of_year_index(dates).astype(np.int16),
+        trading_day=trading_day_index(dates),
+    )
+
+
+def calendar(prices):
+    # (year, doy, trading_day) arrays, from the stored columns when present
+    if all(column in prices.columns for column in CALENDAR_COLUMNS):
+        return tuple(prices[column].to_numpy() for column in CALENDAR_COLUMNS)
+    dates = pd.DatetimeIndex(prices['date'])
+    return dates.year.to_numpy(), day_of_year_index(dates), trading_day_index(dates)